@@ -0,0 +1 @@
+"""Headless analytics pipeline behind the Streamlit dashboard (no Streamlit imports here)."""
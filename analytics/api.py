@@ -0,0 +1,225 @@
+"""Local JSON API over the shared dataset: the dashboard's numbers for other tools.
+
+Serves KPIs, hour/shift/operator/fleet-type aggregates and risk-tier counts
+for a filter, computed from the same aggregate cube the dashboard uses (a
+DatasetWatcher keeps it fresh). Responses are cached for FATIGUE_API_CACHE_SECONDS,
+keyed by the data version and the normalized filter (order, duplicates and
+"a,b" vs "a&b" forms do not matter), with LRU eviction.
+
+Endpoints (GET):
+    /health                  row count, load time, cache hits/misses
+    /kpis                    total, operators, equipment, avg duration
+    /aggregates/<name>       hour | shift | operator | fleet_type | risk
+    /summary                 kpis plus every aggregate
+
+Filters (query parameters, lists repeatable or comma separated):
+    year, month, week, operator, shift, fleet_type, site, date_from, date_to (YYYY-MM-DD),
+    hour_from, hour_to (0-23), count=alerts|episodes
+
+Usage:
+    python -m analytics.api [--host 127.0.0.1] [--port 8502]
+    curl "http://127.0.0.1:8502/kpis?shift=1&date_from=2024-05-01&date_to=2024-05-31"
+"""
+import argparse
+import json
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from analytics.figcache import FigureCache
+from analytics.filters import FilterEngine
+from analytics.pipeline import kpis, plain, rollup, select
+from analytics.schema import SOURCE_COLUMN
+
+API_HOST = os.environ.get("FATIGUE_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("FATIGUE_API_PORT", 8502))
+# Seconds a cached response is served before it is computed again
+API_CACHE_SECONDS = float(os.environ.get("FATIGUE_API_CACHE_SECONDS", 60))
+API_CACHE_ENTRIES = 4096
+
+LIST_FILTERS = ("year", "month", "week", "operator", "shift", "fleet_type", "site")
+DATE_FILTERS = ("date_from", "date_to")
+HOUR_FILTERS = ("hour_from", "hour_to")
+COUNT_MODES = ("alerts", "episodes")
+
+AGGREGATES = {
+    "hour": lambda view, cm: rollup("hour", view, cm),
+    "shift": lambda view, cm: rollup("shift", view, cm) if cm.shift else None,
+    "operator": lambda view, cm: rollup("operator", view, cm) if cm.operator else None,
+    "fleet_type": lambda view, cm: rollup("fleet_type", view, cm) if cm.fleet_type else None,
+    # Tiers with no alerts are missing from the chart data; the API reports them as 0
+    "risk": lambda view, cm: rollup("risk", view, cm).fillna(0).astype("int64") if cm.speed else None,
+}
+
+logger = logging.getLogger("fatigue.api")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def normalize_filters(query):
+    """Canonical, hashable form of the query parameters (a dict of lists, as parse_qs returns)."""
+    unknown = set(query) - set(LIST_FILTERS + DATE_FILTERS + HOUR_FILTERS + ("count",))
+    if unknown:
+        raise BadRequest(f"unknown parameter(s): {', '.join(sorted(unknown))}")
+    normalized = []
+    for name in LIST_FILTERS:
+        values = {v.strip() for raw in query.get(name, []) for v in raw.split(",") if v.strip()}
+        if values:
+            normalized.append((name, tuple(sorted(values))))
+    for name in DATE_FILTERS:
+        if query.get(name):
+            try:
+                normalized.append((name, pd.Timestamp(query[name][-1]).strftime("%Y-%m-%d")))
+            except ValueError:
+                raise BadRequest(f"{name} must be a date (YYYY-MM-DD)")
+    for name in HOUR_FILTERS:
+        if query.get(name):
+            try:
+                hour = int(query[name][-1])
+            except ValueError:
+                hour = -1
+            if not 0 <= hour <= 23:
+                raise BadRequest(f"{name} must be an hour 0-23")
+            normalized.append((name, hour))
+    count = query.get("count", ["alerts"])[-1]
+    if count not in COUNT_MODES:
+        raise BadRequest(f"count must be one of {', '.join(COUNT_MODES)}")
+    normalized.append(("count", count))
+    return tuple(normalized)
+
+
+def _matching(index, col, values):
+    # Query values are strings: match them to the column's own values by their text
+    _, uniques = index.codes(col)
+    by_text = {str(u): u for u in uniques}
+    return [by_text[v] for v in values if v in by_text]
+
+
+def filtered_view(dataset, filters):
+    """CubeView of a dataset for normalized filters."""
+    f = dict(filters)
+    cube = dataset.episodes.cube if f["count"] == "episodes" else dataset.cube
+    cm = dataset.column_map
+    engine = FilterEngine(cube.index)
+    columns = {"year": "year", "month": "month", "week": "week", "operator": cm.operator,
+               "shift": cm.shift, "fleet_type": cm.fleet_type, "site": SOURCE_COLUMN}
+    for name, col in columns.items():
+        if name not in f:
+            continue
+        if not col or col not in cube.cells.columns:
+            raise BadRequest(f"this dataset has no {name} column")
+        engine.isin(col, _matching(cube.index, col, f[name]))
+    if "date_from" in f or "date_to" in f:
+        select(engine, cm, date_range=(f.get("date_from", pd.Timestamp.min), f.get("date_to", pd.Timestamp.max)))
+    if "hour_from" in f or "hour_to" in f:
+        select(engine, cm, hour_range=(f.get("hour_from", 0), f.get("hour_to", 23)))
+    return cube.view(engine)
+
+
+class AggregateAPI:
+    """Request handling without the HTTP layer: (path, query) -> (status, JSON body)."""
+
+    def __init__(self, watcher, ttl=API_CACHE_SECONDS, max_entries=API_CACHE_ENTRIES):
+        self.watcher = watcher
+        self.cache = FigureCache(max_entries=max_entries, ttl=ttl)
+
+    def handle(self, path, query):
+        try:
+            if path == "/health":
+                return 200, self._encode(self._health())
+            filters = normalize_filters(query)
+            dataset = self.watcher.current()
+            if path == "/kpis":
+                build = lambda: self._response(dataset, filters, kpis)
+            elif path == "/summary":
+                build = lambda: self._response(dataset, filters, self._summary)
+            elif path.startswith("/aggregates/") and path.split("/", 2)[2] in AGGREGATES:
+                build = lambda: self._response(dataset, filters, AGGREGATES[path.split("/", 2)[2]])
+            else:
+                return 404, self._encode({"error": f"unknown endpoint {path}"})
+            return 200, self.cache.get(path, (dataset.version, filters), build)
+        except BadRequest as e:
+            return 400, self._encode({"error": str(e)})
+
+    def _health(self):
+        dataset = self.watcher.current()
+        return {
+            "rows": len(dataset.df),
+            "loaded_at": dataset.loaded_at.isoformat(timespec="seconds"),
+            "refresh_error": None if self.watcher.last_error is None else str(self.watcher.last_error),
+            "cache": {"entries": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses},
+        }
+
+    @staticmethod
+    def _summary(view, cm):
+        return {"kpis": kpis(view, cm), **{name: agg(view, cm) for name, agg in AGGREGATES.items()}}
+
+    def _response(self, dataset, filters, compute):
+        view = filtered_view(dataset, filters)
+        return self._encode({
+            "loaded_at": dataset.loaded_at.isoformat(timespec="seconds"),
+            "filters": dict(filters),
+            "data": compute(view, dataset.column_map),
+        })
+
+    @staticmethod
+    def _encode(payload):
+        return json.dumps(plain(payload), ensure_ascii=False).encode("utf-8")
+
+
+def make_server(api, host=API_HOST, port=API_PORT):
+    """A threading HTTP server answering GET requests from ``api``."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            try:
+                status, body = api.handle(url.path.rstrip("/") or "/", parse_qs(url.query))
+            except Exception:
+                logger.exception("request failed: %s", self.path)
+                status, body = 500, b'{"error": "internal error"}'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        # The default backlog of 5 drops connections under a burst of pollers (clients retry after ~1s)
+        request_queue_size = 128
+
+    return Server((host, port), Handler)
+
+
+def main():
+    from analytics.refresh import DatasetWatcher
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--ttl", type=float, default=API_CACHE_SECONDS, help="seconds a cached response is served")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    api = AggregateAPI(DatasetWatcher().start(), ttl=args.ttl)
+    server = make_server(api, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_port} (data as of {api.watcher.current().loaded_at:%Y-%m-%d %H:%M:%S})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""On-disk columnar cache for the normalized workbook.
+
+Parsing the xlsx through openpyxl dominates cold start, and Streamlit's caches
+only live inside one server process. The normalized frame is written once as
+an uncompressed Feather (Arrow IPC) file, which later starts and other workers
+memory-map instead of parsing the workbook again. The cache file name embeds a
+key built from the source path, size, mtime and content hash, so editing or
+replacing the workbook rebuilds it automatically.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import numpy as np
+import pandas as pd
+
+from analytics.ingest import BLOCK_ROWS, DATA_FILE, ColumnMap, align_columns, iter_workbook_blocks, load_workbook, normalize_frame
+from analytics.schema import SCHEMA_VERSION, apply_schema
+
+CACHE_DIR = os.environ.get("FATIGUE_CACHE_DIR", ".cache")
+# Workbooks at least this large are ingested block by block (bounded memory)
+STREAM_THRESHOLD_BYTES = int(os.environ.get("FATIGUE_STREAM_THRESHOLD_MB", 20)) * 1024 * 1024
+_META_KEY = b"fatigue_cache"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    """Identity of the source file: path, size, mtime and content hash."""
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_sha256(path),
+    }
+
+
+def source_stamp(path):
+    """Cheap (size, mtime) stamp used to invalidate in-process caches; None if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def cache_key(fingerprint):
+    # The schema version is part of the key so a dtype change never serves an old layout
+    keyed = {**fingerprint, "schema": SCHEMA_VERSION}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def cache_path_for(path, cache_dir=CACHE_DIR, fingerprint=None):
+    fingerprint = fingerprint or source_fingerprint(path)
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+    return os.path.join(cache_dir, f"{stem}-{cache_key(fingerprint)}.feather")
+
+
+def arrow_safe(df):
+    """Shallow copy with mixed-type object columns turned into strings (missing values kept).
+
+    Free-text cells holding numbers make a column unwritable to Arrow as-is.
+    """
+    df = df.copy(deep=False)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _with_meta(schema, column_map, extra_meta):
+    meta = {"column_map": column_map._asdict(), **(extra_meta or {})}
+    return schema.with_metadata({**(schema.metadata or {}), _META_KEY: json.dumps(meta).encode()})
+
+
+def _atomic_tmp(path):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    return tmp_path
+
+
+def write_frame(df, column_map, path, extra_meta=None):
+    """Atomically write a frame plus its ColumnMap as a Feather file."""
+    table = pa.Table.from_pandas(arrow_safe(df), preserve_index=False)
+    table = table.replace_schema_metadata(_with_meta(table.schema, column_map, extra_meta).metadata)
+
+    tmp_path = _atomic_tmp(path)
+    try:
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _block_schema(df):
+    """Fixed Arrow schema for all blocks, derived from the first normalized block.
+
+    Free-text columns are strings, plain integer columns become float64 (a later
+    block may hold missing values) and categoricals use int32 indices so their
+    dictionaries can grow block by block as deltas.
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+        dtype = df[field.name].dtype
+        if dtype == object:
+            schema = schema.set(i, field.with_type(pa.string()))
+        elif pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+        elif isinstance(dtype, np.dtype) and dtype.kind in "iu":
+            schema = schema.set(i, field.with_type(pa.float64()))
+        elif pa.types.is_dictionary(field.type):
+            schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+    return schema
+
+
+def stream_to_cache(path, cache_file, block_rows=BLOCK_ROWS, extra_meta=None):
+    """Normalize a workbook block by block straight into a Feather file; returns the ColumnMap.
+
+    Peak memory is a few blocks regardless of workbook size: each block is read
+    in openpyxl read-only mode, normalized with the usual column detection and
+    appended as a record batch.
+    """
+    tmp_path = _atomic_tmp(cache_file)
+    writer = sink = None
+    column_map = schema = None
+    categories = {}
+    try:
+        for raw, profile in iter_workbook_blocks(path, block_rows):
+            block, block_map = normalize_frame(raw, profile)
+            if column_map is None:
+                column_map = block_map
+                schema = _block_schema(arrow_safe(block))
+                categories = {name: [] for name in schema.names if isinstance(block[name].dtype, pd.CategoricalDtype)}
+                sink = pa.OSFile(tmp_path, "wb")
+                writer = pa.ipc.new_file(sink, _with_meta(schema, column_map, extra_meta),
+                                         options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+            else:
+                block = align_columns(block, block_map, column_map)
+            block = block.reindex(columns=schema.names)
+
+            # Categories only ever grow, so each batch's dictionary extends the previous one
+            for name, known in categories.items():
+                values = block[name].astype(object)
+                known.extend(sorted(set(values.dropna().unique()) - set(known)))
+                block[name] = pd.Categorical(values, categories=known)
+
+            table = pa.Table.from_pandas(arrow_safe(block), preserve_index=False)
+            writer.write_table(table.cast(schema))
+
+        if writer is None:
+            raise ValueError(f"No rows found in {path}")
+        writer.close()
+        sink.close()
+        os.replace(tmp_path, cache_file)
+    except BaseException:
+        if sink is not None:
+            sink.close()
+        os.unlink(tmp_path)
+        raise
+    return column_map
+
+
+def read_meta(path):
+    schema = feather.read_table(path, memory_map=True).schema
+    return json.loads(schema.metadata[_META_KEY])
+
+
+def read_frame(path):
+    """Memory-map a cache file and return (frame, ColumnMap, metadata)."""
+    table = feather.read_table(path, memory_map=True)
+    meta = json.loads(table.schema.metadata[_META_KEY])
+    # One block per column keeps fixed-width columns as zero-copy views of the mapped file
+    return table.to_pandas(split_blocks=True), ColumnMap(**meta["column_map"]), meta
+
+
+def _remove_stale(cache_file):
+    # Older cache files for the same workbook (different key) are dead weight
+    directory, name = os.path.split(cache_file)
+    prefix = name.rsplit("-", 1)[0] + "-"
+    for other in os.listdir(directory):
+        # The key has no "-", so "site-2-<key>" is not mistaken for a stale "site-<key>"
+        key = other[len(prefix):-len(".feather")]
+        if other.startswith(prefix) and other.endswith(".feather") and "-" not in key and other != name:
+            try:
+                os.remove(os.path.join(directory, other))
+            except OSError:
+                pass
+
+
+def load_cached(path=DATA_FILE, cache_dir=CACHE_DIR, loader=load_workbook, streaming=None):
+    """Return (frame, ColumnMap) for a workbook, parsing it only on a cache miss.
+
+    ``streaming`` forces the block-by-block ingest on or off; by default it is
+    used for workbooks of at least STREAM_THRESHOLD_BYTES.
+    """
+    fingerprint = source_fingerprint(path)
+    cache_file = cache_path_for(path, cache_dir, fingerprint)
+    if os.path.exists(cache_file):
+        try:
+            df, column_map, _ = read_frame(cache_file)
+            return apply_schema(df, column_map), column_map
+        except (OSError, KeyError, ValueError, pa.ArrowException):
+            pass  # corrupt or foreign file: rebuild below
+
+    if streaming is None:
+        streaming = fingerprint["size"] >= STREAM_THRESHOLD_BYTES
+    if streaming:
+        stream_to_cache(path, cache_file, extra_meta={"source": fingerprint})
+        _remove_stale(cache_file)
+        df, column_map, _ = read_frame(cache_file)
+        return apply_schema(df, column_map), column_map
+
+    df, column_map = loader(path)
+    write_frame(df, column_map, cache_file, {"source": fingerprint})
+    _remove_stale(cache_file)
+    return df, column_map
@@ -0,0 +1,161 @@
+"""Pre-aggregated alert cube that every dashboard chart and insight rolls up.
+
+Alerts are grouped once per dataset version by
+(date, hour, shift, operator, asset, fleet type, speed bucket, source file),
+keeping the alert count and duration sum per cell. Filters are applied to the cells with
+the same FilterEngine selections as the raw frame, and each chart is a small
+group-by over the surviving cells instead of a scan of the raw alerts.
+
+With the default 1 km/h speed bucket and integer speeds (as exported by the
+cameras) speed quantiles, and therefore risk tiers, are exact.
+
+Large selections on partition columns only (dates, calendar parts, shift) read
+speed quantiles and distinct operator/asset counts off merged per-partition
+sketches (see analytics.sketches); distinct counts are then estimates.
+"""
+import numpy as np
+import pandas as pd
+
+from analytics.filters import FilterIndex
+from analytics.risk import CRITICAL_HOURS, RISK_LEVELS, categorize_risk
+from analytics.schema import SOURCE_COLUMN
+from analytics.sketches import SKETCH_MIN_ALERTS, PartitionSketches
+
+SPEED_BUCKET = "speed_bucket"
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def weighted_quantile(values, weights, q):
+    """Quantile of the rows behind (value, count) pairs, with Series.quantile's linear interpolation."""
+    values = np.asarray(values, dtype="float64")
+    weights = np.asarray(weights, dtype="int64")
+    keep = ~np.isnan(values) & (weights > 0)
+    values, weights = values[keep], weights[keep]
+    if not len(values):
+        return np.nan
+    order = np.argsort(values, kind="stable")
+    values, ends = values[order], np.cumsum(weights[order])
+
+    pos = (ends[-1] - 1) * q
+    lo = int(np.floor(pos))
+    frac = pos - lo
+    v_lo = values[np.searchsorted(ends, lo, side="right")]
+    if frac == 0:
+        return float(v_lo)
+    v_hi = values[np.searchsorted(ends, lo + 1, side="right")]
+    return float(v_lo + (v_hi - v_lo) * frac)
+
+
+class AlertCube:
+    """Aggregated cells of one dataset version plus a FilterIndex over them."""
+
+    def __init__(self, df, column_map, speed_bucket=1.0):
+        self.column_map = column_map
+        self.speed_bucket = speed_bucket
+        self.cells = self._build(df, column_map, speed_bucket)
+        self.index = FilterIndex(self.cells)
+        self.sketches = PartitionSketches(self.cells, column_map, SPEED_BUCKET)
+        self.sketch_min_alerts = SKETCH_MIN_ALERTS
+
+    @staticmethod
+    def _build(df, column_map, width):
+        frame = df.copy(deep=False)
+        if column_map.speed:
+            speed = pd.to_numeric(frame[column_map.speed], errors="coerce")
+            frame[SPEED_BUCKET] = np.floor(speed / width) * width
+        else:
+            frame[SPEED_BUCKET] = np.nan
+
+        dims = ["date", "hour"] + [c for c in dict.fromkeys(
+            (column_map.shift, column_map.operator, column_map.asset, column_map.fleet_type)) if c]
+        dims.append(SPEED_BUCKET)
+        if SOURCE_COLUMN in frame.columns:
+            # Per-site (per-export) selections for the batch reports
+            dims.append(SOURCE_COLUMN)
+        cells = (
+            frame.groupby(dims, dropna=False, observed=True, sort=False)
+            .agg(alerts=("start", "size"), duration_sum=("duration_sec", "sum"), duration_n=("duration_sec", "count"))
+            .reset_index()
+        )
+        # Calendar columns so the year/month/week/day filters and rollups work on cells
+        day = pd.to_datetime(cells["date"])
+        cells["year"] = day.dt.year
+        cells["month"] = day.dt.month
+        cells["week"] = day.dt.isocalendar().week
+        cells["day_of_week"] = day.dt.day_name()
+        return cells
+
+    def view(self, engine=None):
+        """Cells matching the selections recorded on a FilterEngine (all cells if None)."""
+        cells = self.cells if engine is None else engine.replay(self.index).apply()
+        sketch = None
+        if self.sketches.covers(engine) and cells["alerts"].sum() >= self.sketch_min_alerts:
+            sketch = self.sketches.merge(engine)
+        return CubeView(cells, self.column_map, sketch)
+
+
+class CubeView:
+    """Rollups over a filtered set of cube cells (plus the merged partition sketch of large selections)."""
+
+    def __init__(self, cells, column_map, sketch=None):
+        self.cells = cells
+        self.column_map = column_map
+        self.sketch = sketch
+
+    @property
+    def approximate(self):
+        """True when distinct counts are HyperLogLog estimates."""
+        return self.sketch is not None
+
+    @property
+    def total(self):
+        return int(self.cells["alerts"].sum())
+
+    def counts(self, *dims):
+        """Alerts per value of ``dims`` (missing keys dropped, like groupby/value_counts)."""
+        return self.cells.groupby(list(dims), observed=True)["alerts"].sum()
+
+    def ranked(self, dim):
+        """Alerts per value of ``dim``, highest first (value_counts order).
+
+        Cells keep the order of their first alert, so ties fall back to first
+        appearance exactly as value_counts does.
+        """
+        counts = self.cells.groupby(dim, observed=True, sort=False)["alerts"].sum()
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def nunique(self, dim):
+        if self.sketch is not None and dim in self.sketch.distinct:
+            return int(round(self.sketch.distinct[dim]))
+        return self.cells.loc[self.cells["alerts"] > 0, dim].nunique()
+
+    def mean_duration(self):
+        n = self.cells["duration_n"].sum()
+        return self.cells["duration_sum"].sum() / n if n else np.nan
+
+    def speed_quantile(self, q):
+        if self.sketch is not None:
+            return weighted_quantile(self.sketch.speed_values, self.sketch.speed_counts, q)
+        return weighted_quantile(self.cells[SPEED_BUCKET], self.cells["alerts"], q)
+
+    def speed_quartiles(self):
+        return tuple(self.speed_quantile(q) for q in (0.25, 0.5, 0.75))
+
+    def alerts_where(self, mask):
+        return int(self.cells.loc[mask, "alerts"].sum())
+
+    def critical_hour_alerts(self):
+        return self.alerts_where(self.cells["hour"].isin(CRITICAL_HOURS))
+
+    def high_speed_alerts(self, threshold):
+        if self.sketch is not None:
+            return int(self.sketch.speed_counts[self.sketch.speed_values >= threshold].sum())
+        return self.alerts_where(self.cells[SPEED_BUCKET] >= threshold)
+
+    def day_of_week_counts(self):
+        return self.counts("day_of_week").reindex(DAY_ORDER)
+
+    def risk_counts(self):
+        """Alerts per risk tier, Critical/High/Medium/Low order."""
+        tiers = categorize_risk(self.cells[SPEED_BUCKET], self.cells["hour"], self.speed_quartiles())
+        return self.cells["alerts"].groupby(tiers.to_numpy()).sum().reindex(RISK_LEVELS)
@@ -0,0 +1,66 @@
+"""Server-side reduction of the per-alert scatter charts.
+
+Above ``max_points`` rows, the hour × speed and hour × duration scatters are
+either replaced by a 2D-binned density (counts only, a few hundred cells) or
+by a stratified sample per hour that always keeps the outliers. The sampled
+points are real alert rows, so their hover detail is unchanged.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+MAX_SCATTER_POINTS = int(os.environ.get("FATIGUE_MAX_SCATTER_POINTS", 5000))
+MODE_SAMPLE = "sample"
+MODE_DENSITY = "density"
+
+
+def outlier_mask(df, by, value, k=1.5):
+    """Rows outside the per-group Tukey fences (Q1 - k*IQR, Q3 + k*IQR)."""
+    fences = df.groupby(by, observed=True)[value].quantile([0.25, 0.75]).unstack()
+    q1 = df[by].map(fences[0.25])
+    q3 = df[by].map(fences[0.75])
+    iqr = q3 - q1
+    return ((df[value] < q1 - k * iqr) | (df[value] > q3 + k * iqr)).to_numpy()
+
+
+def stratified_sample(df, by, value, max_points=MAX_SCATTER_POINTS, k=1.5, outlier_share=0.5, seed=0):
+    """At most ~max_points rows: the outliers plus a proportional random sample of each ``by`` group.
+
+    Outliers may use up to ``outlier_share`` of the budget; when there are more,
+    the ones furthest from the median are kept.
+    """
+    if len(df) <= max_points:
+        return df
+    outliers = outlier_mask(df, by, value, k)
+    cap = int(max_points * outlier_share)
+    if outliers.sum() > cap:
+        spread = np.array((df[value] - df[value].median()).abs(), dtype="float64")
+        spread[~outliers] = -np.inf
+        outliers = np.zeros(len(df), dtype=bool)
+        outliers[np.argsort(-spread, kind="stable")[:cap]] = True
+
+    rest = df[~outliers]
+    budget = max_points - int(outliers.sum())
+    # Each group keeps its share of the budget (at least one row), chosen by a random rank
+    sizes = rest.groupby(by, observed=True)[value].transform("size").to_numpy()
+    quota = np.maximum(1, np.floor(sizes * budget / len(rest)))
+    rng = np.random.default_rng(seed)
+    rank = pd.Series(rng.random(len(rest)), index=rest.index).groupby(rest[by].to_numpy()).rank(method="first")
+    keep = np.zeros(len(df), dtype=bool)
+    keep[np.flatnonzero(~outliers)[rank.to_numpy() <= quota]] = True
+    return df[keep | outliers]
+
+
+def binned_density(df, x, y, y_bins=40):
+    """Alert counts on an (x, binned y) grid; ``x`` is kept as-is (hour is already discrete)."""
+    values = df[[x, y]].dropna()
+    if values.empty:
+        return pd.DataFrame(columns=[x, y, "alerts"])
+    edges = np.histogram_bin_edges(values[y].to_numpy(dtype="float64"), bins=y_bins)
+    idx = np.clip(np.searchsorted(edges, values[y].to_numpy(dtype="float64"), side="right") - 1, 0, len(edges) - 2)
+    centers = (edges[:-1] + edges[1:]) / 2
+    return (
+        pd.DataFrame({x: values[x].to_numpy(), y: centers[idx]})
+        .groupby([x, y]).size().reset_index(name="alerts")
+    )
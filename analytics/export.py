@@ -0,0 +1,101 @@
+"""Chunked export of a filtered alert frame as CSV, gzip CSV or Parquet.
+
+Rows are written ``chunk_rows`` at a time straight to the target file object,
+so exporting a whole quarter never builds the full file as one string.
+
+Usage:
+    python -m analytics.export alerts-q3.csv.gz --from 2025-07-01 --to 2025-09-30 [--shifts 2]
+"""
+import argparse
+import gzip
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics.cache import arrow_safe
+from analytics.filters import FilterEngine, FilterIndex
+from analytics.ingest import DATA_FILE
+from analytics.pipeline import select
+from analytics.risk import categorize_risk
+from analytics.store import STORE_FILE, open_store
+
+CHUNK_ROWS = 50_000
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "csv.gz": ("application/gzip", ".csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+def iter_csv_chunks(df, chunk_rows=CHUNK_ROWS):
+    """Yield the frame as UTF-8 CSV bytes, one chunk of rows at a time (header first)."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode("utf-8")
+
+
+def _parquet_schema(df):
+    # Derived from the empty frame so every chunk shares one schema; object
+    # columns are free text and may be all-null in the first chunk.
+    schema = pa.Schema.from_pandas(df.head(0), preserve_index=False)
+    for i, name in enumerate(schema.names):
+        if df[name].dtype == object:
+            schema = schema.set(i, pa.field(name, pa.string()))
+    return schema
+
+
+def write_export(df, fileobj, fmt="csv", chunk_rows=CHUNK_ROWS):
+    """Write ``df`` to a binary file object in ``fmt`` (see FORMATS); returns rows written."""
+    if fmt == "csv":
+        for chunk in iter_csv_chunks(df, chunk_rows):
+            fileobj.write(chunk)
+    elif fmt == "csv.gz":
+        with gzip.GzipFile(fileobj=fileobj, mode="wb") as gz:
+            for chunk in iter_csv_chunks(df, chunk_rows):
+                gz.write(chunk)
+    elif fmt == "parquet":
+        schema = _parquet_schema(df)
+        with pq.ParquetWriter(fileobj, schema) as writer:
+            for start in range(0, len(df), chunk_rows):
+                chunk = arrow_safe(df.iloc[start:start + chunk_rows])
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    return len(df)
+
+
+def export_to_path(df, path, fmt=None, chunk_rows=CHUNK_ROWS):
+    """Export to ``path``; the format defaults to the file extension."""
+    fmt = fmt or next((f for f, (_, ext) in FORMATS.items() if path.endswith(ext) and f != "csv"), "csv")
+    with open(path, "wb") as f:
+        return write_export(df, f, fmt, chunk_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="target file; .csv, .csv.gz or .parquet")
+    parser.add_argument("--format", choices=list(FORMATS), default=None)
+    parser.add_argument("--from", dest="date_from", default=None, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", default=None, help="last day (YYYY-MM-DD)")
+    parser.add_argument("--shifts", type=int, nargs="+", default=None)
+    parser.add_argument("--operators", nargs="+", default=None)
+    parser.add_argument("--workbook", default=DATA_FILE)
+    parser.add_argument("--store", default=STORE_FILE)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    df, column_map, _ = open_store(args.workbook, args.store)
+    date_range = None
+    if args.date_from or args.date_to:
+        date_range = (args.date_from or df["date"].min(), args.date_to or df["date"].max())
+    engine = select(FilterEngine(FilterIndex(df)), column_map, date_range=date_range,
+                    operators=args.operators, shifts=args.shifts)
+    df = engine.apply(df)
+    if column_map.speed:
+        df = df.assign(risk_category=categorize_risk(df[column_map.speed], df["hour"]))
+    rows = export_to_path(df, args.output, args.format, args.chunk_rows)
+    print(f"{rows:,} alerts written to {args.output} ({os.path.getsize(args.output) / 1024 ** 2:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Process-wide LRU cache of built Plotly figures.
+
+Figures are keyed by chart name, dataset version and the filter state (see
+``FilterEngine.state_key``) plus any chart-specific settings, so a widget
+change that cannot affect a chart serves the previously built figure instead
+of re-running its rollups and layout code. Eviction is least-recently-used,
+bounded by entry count and by the figures' serialized size.
+
+Other per-section results (e.g. the Insights of a selection) can be cached the
+same way; they are sized by their pickled length (bytes by their length). With
+a ``ttl`` entries also expire that many seconds after they were built.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import plotly.io as pio
+
+FIGURE_CACHE_BYTES = int(os.environ.get("FATIGUE_FIGURE_CACHE_MB", 128)) * 1024 * 1024
+FIGURE_CACHE_ENTRIES = 512
+
+
+def _size(value):
+    if isinstance(value, bytes):
+        return len(value)
+    if hasattr(value, "to_plotly_json"):
+        return len(pio.to_json(value, validate=False))
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES, max_entries=FIGURE_CACHE_ENTRIES, ttl=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (figure, size, expires)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name, key, build):
+        """Return the cached figure for (name, key), calling ``build()`` on a miss."""
+        full_key = (name, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                # Expired: drop it and rebuild like a miss
+                del self._entries[full_key]
+                self.nbytes -= entry[1]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Build outside the lock so sessions do not serialize on slow charts
+        fig = build()
+        if fig is None:
+            return None
+        size = _size(fig)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if full_key not in self._entries and size <= self.max_bytes:
+                self._entries[full_key] = (fig, size, expires)
+                self.nbytes += size
+                self._evict()
+        return fig
+
+    def _evict(self):
+        while self._entries and (self.nbytes > self.max_bytes or len(self._entries) > self.max_entries):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self.nbytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
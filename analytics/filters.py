@@ -0,0 +1,172 @@
+"""Single-pass sidebar filtering over precomputed integer codes.
+
+Every filterable column is factorized once per dataset (``FilterIndex``).
+A ``FilterEngine`` then ANDs each widget's selection into one boolean mask
+and materializes the filtered frame a single time at the end. Option lists
+for the widgets are read off the codes under the current mask, so they
+cascade exactly like the old ``df = df[...]`` chain without copying the frame.
+
+Frames sorted by ``start`` (the store and multi-file loads are) also get a
+time index: date and hour ranges become binary-search slices, and every later
+selection only touches the rows inside the selected time window.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+HOUR_NS = 3_600 * 10**9
+DAY_NS = 24 * HOUR_NS
+
+
+class FilterIndex:
+    """Sorted factorization of the filterable columns of one dataset (built lazily, reused across reruns)."""
+
+    def __init__(self, df):
+        self.df = df
+        self._codes = {}
+        self._start = None
+
+    def __len__(self):
+        return len(self.df)
+
+    def time_index(self):
+        """int64 ns starts of the dated rows when the frame is sorted by ``start`` (missing last), else None."""
+        if self._start is None:
+            self._start = False
+            if "start" in self.df.columns:
+                start = self.df["start"]
+                n = int(start.notna().sum())
+                if start.iloc[:n].notna().all() and start.iloc[:n].is_monotonic_increasing:
+                    self._start = start.iloc[:n].to_numpy(dtype="datetime64[ns]").view("int64")
+        return None if self._start is False else self._start
+
+    def codes(self, col):
+        """Return (codes, uniques); codes are positions in the sorted uniques, -1 for missing."""
+        if col not in self._codes:
+            codes, uniques = pd.factorize(self.df[col], sort=True)
+            self._codes[col] = (codes, pd.Index(uniques))
+        return self._codes[col]
+
+
+class FilterEngine:
+    """Accumulates one combined mask over a FilterIndex.
+
+    ``selections`` records the selections that narrowed the rows; one that
+    keeps every row (e.g. all operators selected) is left out, so replays and
+    partition-level shortcuts only see the filters that matter.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.mask = np.ones(len(index), dtype=bool)
+        self.selections = []
+        # Rows outside [lo, hi) are deselected; time slices narrow this window
+        self.lo, self.hi = 0, len(index)
+
+    def _narrow(self, lo, hi):
+        lo, hi = max(lo, self.lo), max(min(hi, self.hi), max(lo, self.lo))
+        self.mask[self.lo:lo] = False
+        self.mask[hi:self.hi] = False
+        self.lo, self.hi = lo, hi
+
+    def _present(self, col):
+        codes, uniques = self.index.codes(col)
+        hit = codes[self.lo:self.hi][self.mask[self.lo:self.hi]]
+        return np.bincount(hit[hit >= 0], minlength=len(uniques)) > 0, uniques
+
+    def options(self, col):
+        """Sorted non-missing values of ``col`` among the rows still selected."""
+        present, uniques = self._present(col)
+        return uniques[present].tolist()
+
+    def value_range(self, col):
+        """(min, max) of ``col`` among the rows still selected, or (None, None)."""
+        present, uniques = self._present(col)
+        hits = np.flatnonzero(present)
+        if not len(hits):
+            return None, None
+        return uniques[hits[0]], uniques[hits[-1]]
+
+    def _kept(self):
+        # Rows outside the window are already deselected, so the window's count is the total
+        return int(np.count_nonzero(self.mask[self.lo:self.hi]))
+
+    def _record(self, selection, before):
+        if self._kept() != before:
+            self.selections.append(selection)
+
+    def isin(self, col, values):
+        before = self._kept()
+        codes, uniques = self.index.codes(col)
+        wanted = uniques.get_indexer(pd.Index(list(values), dtype=uniques.dtype if len(values) else None))
+        lookup = np.zeros(len(uniques) + 1, dtype=bool)
+        lookup[wanted[wanted >= 0]] = True
+        # codes of -1 (missing) index the trailing False slot
+        self.mask[self.lo:self.hi] &= lookup[codes[self.lo:self.hi]]
+        self._record(("isin", col, tuple(values)), before)
+        return self
+
+    def between(self, col, low, high):
+        """Keep rows with low <= col <= high (inclusive), via code bounds on the sorted uniques."""
+        before = self._kept()
+        self._between(col, low, high)
+        self._record(("between", col, (low, high)), before)
+        return self
+
+    def _between(self, col, low, high):
+        start = self.index.time_index()
+        if start is not None and col in ("date", "start"):
+            # "date" is the calendar day of start, so a day range is one slice of the sorted starts
+            low_ns = pd.Timestamp(low).value
+            high_ns = pd.Timestamp(high).value + (DAY_NS if col == "date" else 1)
+            self._narrow(int(np.searchsorted(start, low_ns, side="left")),
+                         int(np.searchsorted(start, high_ns, side="left")))
+        elif start is not None and col == "hour":
+            self._hour_slices(start, int(low), int(high))
+        else:
+            codes, uniques = self.index.codes(col)
+            lo = uniques.searchsorted(low, side="left")
+            hi = uniques.searchsorted(high, side="right")
+            self.mask[self.lo:self.hi] &= (codes[self.lo:self.hi] >= lo) & (codes[self.lo:self.hi] < hi)
+
+    def _hour_slices(self, start, low, high):
+        # Within each day of the window the hours low..high are one slice of the sorted starts
+        hi = min(self.hi, len(start))
+        self._narrow(self.lo, hi)
+        if self.lo >= self.hi:
+            return
+        window = start[self.lo:self.hi]
+        days = np.arange(window[0] // DAY_NS, window[-1] // DAY_NS + 1) * DAY_NS
+        begins = np.searchsorted(window, days + low * HOUR_NS, side="left")
+        ends = np.searchsorted(window, days + (high + 1) * HOUR_NS, side="left")
+        # +1 at each slice start, -1 at its end: a running sum > 0 marks the rows inside a slice
+        marks = np.zeros(len(window) + 1, dtype=np.int32)
+        np.add.at(marks, begins, 1)
+        np.add.at(marks, ends, -1)
+        self.mask[self.lo:self.hi] &= np.cumsum(marks[:-1]) > 0
+
+    def state_key(self):
+        """Digest of the selected rows; equal for any selections that keep the same rows."""
+        return hashlib.blake2b(np.packbits(self.mask).tobytes(), digest_size=16).hexdigest()
+
+    def replay(self, index):
+        """A new engine over another index (e.g. the aggregate cube) with the same selections."""
+        engine = FilterEngine(index)
+        for method, col, args in self.selections:
+            if method == "isin":
+                engine.isin(col, args)
+            else:
+                engine.between(col, *args)
+        return engine
+
+    def apply(self, df=None):
+        """Materialize the filtered frame once (positional; ``df`` defaults to the indexed frame)."""
+        df = self.index.df if df is None else df
+        if (self.lo, self.hi) != (0, len(df)):
+            df = df.iloc[self.lo:self.hi]
+        mask = self.mask[self.lo:self.hi]
+        if mask.all():
+            # A shallow copy: sessions may add columns without touching the shared frame
+            return df.copy(deep=False)
+        return df[mask]
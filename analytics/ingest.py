@@ -0,0 +1,232 @@
+"""Reading the fatigue workbook and normalizing it into the dashboard frame."""
+import hashlib
+import json
+import os
+import tempfile
+from typing import NamedTuple, Optional
+
+import openpyxl
+import pandas as pd
+
+from analytics.schema import apply_schema
+
+DATA_FILE = 'manual fatique.xlsx'
+# Rows per block when streaming a workbook (bounded-memory ingest)
+BLOCK_ROWS = 20_000
+# Detected column mappings per header layout; edit an entry to override a wrong detection
+PROFILE_FILE = os.path.join(os.environ.get("FATIGUE_CACHE_DIR", ".cache"), "schema_profiles.json")
+
+
+class ColumnMap(NamedTuple):
+    """Source columns detected for each dashboard dimension (None when missing)."""
+    operator: Optional[str]
+    shift: Optional[str]
+    asset: Optional[str]
+    fleet_type: Optional[str]
+    speed: Optional[str]
+
+
+class SchemaProfile(NamedTuple):
+    """Column mapping of one source layout: normalized names plus the raw columns to read."""
+    column_map: ColumnMap
+    time_columns: list
+    usecols: list
+
+
+def normalized_names(columns):
+    return pd.Index(columns).astype(str).str.strip().str.lower().str.replace(" ", "_")
+
+
+def normalize_column_names(df):
+    df.columns = normalized_names(df.columns)
+    return df
+
+
+def detect_columns(columns):
+    # auto detect important columns
+    return ColumnMap(
+        operator=next((c for c in columns if "operator" in c or "driver" in c), None),
+        shift=next((c for c in columns if "shift" in c), None),
+        asset=next((c for c in columns if "asset" in c or "vehicle" in c or "fleet" in c), None),
+        fleet_type=next((c for c in columns if "parent_fleet" in c), None),
+        speed=next((c for c in columns if "speed" in c or "km/h" in c), None),
+    )
+
+
+def detect_time_columns(columns):
+    # detect timestamps (using the actual column names from the provided file)
+    return [c for c in columns if "gmt" in c.lower() and "wita" in c.lower()]
+
+
+def derive_time_columns(df, column_map, time_columns=None):
+    """Add start/end/duration and the calendar columns used by the filters."""
+    start_time_cols = detect_time_columns(df.columns) if time_columns is None else time_columns
+    # Assuming the first one is start and the second is end
+    if len(start_time_cols) >= 2:
+        df["start"] = pd.to_datetime(df[start_time_cols[0]], errors="coerce")
+        df["end"] = pd.to_datetime(df[start_time_cols[1]], errors="coerce")
+    elif len(start_time_cols) == 1:
+        # If only one time column, assume it's start time and set end time to start + 1 minute as a placeholder
+        df["start"] = pd.to_datetime(df[start_time_cols[0]], errors="coerce")
+        df["end"] = df["start"] + pd.Timedelta(minutes=1)
+
+    df["duration_sec"] = (df["end"] - df["start"]).dt.total_seconds()
+    df["hour"] = df["start"].dt.hour
+    df["date"] = df["start"].dt.date # Add date column for filtering
+    df["day_of_week"] = df["start"].dt.day_name() # Add day of week for analysis
+    df["week"] = df["start"].dt.isocalendar().week # Add week for trend analysis
+    df["month"] = df["start"].dt.month # Add month for filtering
+    df["year"] = df["start"].dt.year # Add year for filtering
+
+    # Ensure shift is integer type and handle potential decimal values by rounding
+    if column_map.shift:
+        # Convert to numeric, then round to nearest integer, then convert to int64 to remove decimals
+        df[column_map.shift] = pd.to_numeric(df[column_map.shift], errors='coerce').round().astype('Int64')
+    return df
+
+
+def header_fingerprint(header):
+    return hashlib.sha256(json.dumps([str(c) for c in header]).encode()).hexdigest()[:16]
+
+
+def detect_profile(header):
+    """Run the column heuristics once for a raw header."""
+    names = list(normalized_names(header))
+    column_map = detect_columns(names)
+    time_columns = detect_time_columns(names)[:2]
+    needed = {c for c in column_map if c} | set(time_columns)
+    usecols = [str(raw) for raw, name in zip(header, names) if name in needed]
+    return SchemaProfile(column_map, time_columns, usecols)
+
+
+def _read_profiles(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_profiles(profiles, path):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(profiles, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def schema_profile(header, path=PROFILE_FILE):
+    """SchemaProfile for a raw header, detected on first sight and reused from ``path`` afterwards."""
+    key = header_fingerprint(header)
+    profiles = _read_profiles(path)
+    if key in profiles:
+        entry = profiles[key]
+        return SchemaProfile(ColumnMap(**entry["column_map"]), entry["time_columns"], entry["usecols"])
+
+    profile = detect_profile(header)
+    profiles[key] = {"header": [str(c) for c in header], "column_map": profile.column_map._asdict(),
+                     "time_columns": profile.time_columns, "usecols": profile.usecols}
+    try:
+        _write_profiles(profiles, path)
+    except OSError:
+        pass  # read-only deployment: detection still works, it just isn't remembered
+    return profile
+
+
+def normalize_frame(raw, profile=None):
+    """Normalize a raw sheet (or concatenated sheets) into the typed dashboard frame.
+
+    Only the profile's columns are kept; the raw frame may already be narrowed
+    to them by ``usecols``.
+    """
+    profile = profile or schema_profile(raw.columns)
+    # Explicit copy: later steps write columns, which must not land on a view of ``raw``
+    df = normalize_column_names(raw.loc[:, [c for c in profile.usecols if c in raw.columns]].copy())
+    df = derive_time_columns(df, profile.column_map, profile.time_columns)
+    # Keep the raw timestamp columns as parsed datetimes too: CSV exports carry them as
+    # text, which would turn the merged column into mixed objects (and strings on disk)
+    for col, parsed in zip(profile.time_columns, ["start", "end"]):
+        if col in df.columns:
+            df[col] = df[parsed]
+    return apply_schema(df, profile.column_map), profile.column_map
+
+
+def align_columns(df, source_map, target_map):
+    """Rename the detected columns of ``df`` to the names used by ``target_map``."""
+    renames = {src: dst for src, dst in zip(source_map, target_map) if src and dst and src != dst}
+    return df.rename(columns=renames)
+
+
+def dedupe_header(header):
+    # Same naming as pd.read_excel: blank headers become "Unnamed: i", repeats get ".1", ".2", ...
+    seen = {}
+    names = []
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_header(path):
+    """Raw column names of the first sheet (or the CSV), named the way pandas reads them."""
+    if str(path).lower().endswith(".csv"):
+        return list(pd.read_csv(path, nrows=0).columns)
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        header = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+    finally:
+        wb.close()
+    return dedupe_header(header)
+
+
+def iter_workbook_blocks(path=DATA_FILE, block_rows=BLOCK_ROWS):
+    """Yield (raw block, SchemaProfile) of at most ``block_rows`` rows, sheet by sheet, in openpyxl read-only mode.
+
+    Blocks only hold the profile's columns.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = dedupe_header(header)
+            profile = schema_profile(columns)
+            keep = [columns.index(c) for c in profile.usecols]
+            block = []
+            for row in rows:
+                if all(v is None for v in row):
+                    continue
+                block.append([row[i] if i < len(row) else None for i in keep])
+                if len(block) == block_rows:
+                    yield pd.DataFrame.from_records(block, columns=profile.usecols), profile
+                    block = []
+            if block:
+                yield pd.DataFrame.from_records(block, columns=profile.usecols), profile
+    finally:
+        wb.close()
+
+
+def read_workbook(path=DATA_FILE, usecols=None):
+    # Reading only the needed columns skips parsing the free-text ones entirely
+    wanted = set(usecols) if usecols is not None else None
+    df = pd.read_excel(path, sheet_name=None, engine="openpyxl",
+                       usecols=(lambda c: c in wanted) if wanted is not None else None)
+
+    # If the file has multiple sheets, concatenate them
+    if isinstance(df, dict):
+        df = pd.concat(df.values(), ignore_index=True)
+    return df
+
+
+def load_workbook(path=DATA_FILE):
+    """Parse the workbook and return (frame, ColumnMap)."""
+    profile = schema_profile(read_header(path))
+    return normalize_frame(read_workbook(path, profile.usecols), profile)
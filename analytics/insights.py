@@ -0,0 +1,95 @@
+"""Insight engine: every statistic behind the two insight sections, computed once.
+
+``compute_insights`` reads the filtered cube cells a single time and returns an
+``Insights`` result; "Insights by Advanced Analytics" and "Automated Insight
+Summary" both render from it, and ``summary_lines`` builds the summary bullets
+without any Streamlit dependency.
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from analytics.risk import CRITICAL_HOURS
+
+# Share of all alerts above which a summary bullet is raised
+CRITICAL_SUMMARY_PCT = 15
+HIGH_SPEED_PCT = 20
+# Mean event duration (seconds) that reads as a slow response
+LONG_DURATION_SEC = 10
+# Speed quantile above which an alert counts as high-speed (top 25%)
+HIGH_SPEED_QUANTILE = 0.75
+
+
+class Insights(NamedTuple):
+    """Insight statistics for one filtered selection."""
+    total: int
+    critical_alerts: int
+    peak_hour: Optional[int]
+    avg_duration_sec: float
+    high_speed_threshold: Optional[float]  # None when there is no speed column
+    high_speed_alerts: int
+    shift_counts: Optional[pd.Series]  # alerts per shift, highest first
+    operator_counts: Optional[pd.Series]  # alerts per operator, highest first
+
+    def pct(self, count):
+        return count / self.total * 100 if self.total > 0 else 0
+
+    @property
+    def critical_pct(self):
+        return self.pct(self.critical_alerts)
+
+    @property
+    def high_speed_pct(self):
+        return self.pct(self.high_speed_alerts)
+
+
+def compute_insights(view, column_map):
+    """Insights for a CubeView: one read of the cells, each rollup computed once and shared."""
+    total = view.total
+
+    # The hour rollup gives both the peak hour and the 2-5 AM share
+    by_hour = view.ranked("hour")
+    critical_alerts = int(by_hour[by_hour.index.isin(CRITICAL_HOURS)].sum())
+    peak_hour = int(by_hour.index[0]) if total else None
+
+    threshold = None
+    high_speed_alerts = 0
+    if column_map.speed:
+        # Off the merged speed histogram for large selections, else the cells
+        threshold = view.speed_quantile(HIGH_SPEED_QUANTILE)
+        if not np.isnan(threshold):
+            high_speed_alerts = view.high_speed_alerts(threshold)
+
+    return Insights(
+        total=total,
+        critical_alerts=critical_alerts,
+        peak_hour=peak_hour,
+        avg_duration_sec=view.mean_duration(),
+        high_speed_threshold=threshold,
+        high_speed_alerts=high_speed_alerts,
+        shift_counts=view.ranked(column_map.shift) if column_map.shift else None,
+        operator_counts=view.ranked(column_map.operator) if column_map.operator else None,
+    )
+
+
+def summary_lines(ins):
+    """Markdown bullets of the Automated Insight Summary."""
+    if not ins.total:
+        return []
+    lines = []
+    if ins.peak_hour in CRITICAL_HOURS:
+        lines.append(f"⚠️ Most fatigue risk occurs at **{ins.peak_hour}:00** — during critical circadian low period (2-5 AM). Consider enhanced monitoring.")
+    else:
+        lines.append(f"Most fatigue risk occurs at **{ins.peak_hour}:00** — likely due to circadian drop.")
+    if ins.shift_counts is not None and len(ins.shift_counts):
+        lines.append(f"👷 Highest fatigue recorded in **Shift {ins.shift_counts.index[0]}** — review scheduling & workload.")
+    if ins.operator_counts is not None and len(ins.operator_counts):
+        lines.append(f"⚠️ Operator at highest risk: **{ins.operator_counts.index[0]}** — suggested coaching or rest plan.")
+    if not pd.isna(ins.avg_duration_sec) and ins.avg_duration_sec > LONG_DURATION_SEC:
+        lines.append("⏳ Long fatigue event duration suggests slow response — improve alerting training.")
+    if ins.critical_alerts > 0 and ins.critical_pct > CRITICAL_SUMMARY_PCT:
+        lines.append(f"🌙 **CRITICAL HOUR RISK**: {ins.critical_pct:.1f}% of alerts occur during circadian low (2-5 AM). Consider enhanced monitoring during this period.")
+    if ins.high_speed_alerts > 0 and ins.high_speed_pct > HIGH_SPEED_PCT:
+        lines.append(f"🚀 **HIGH-SPEED RISK**: {ins.high_speed_pct:.1f}% of fatigue events occur at high speeds, increasing accident severity potential.")
+    return lines
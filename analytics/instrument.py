@@ -0,0 +1,81 @@
+"""Hot-path timing of the dashboard sections.
+
+A ``StageTimer`` records wall time, rows in/out and the process memory delta
+of each section of a rerun. Sections are sequential, so ``begin()`` closes the
+previous section; ``stage()`` is the context-manager form. Every finished
+stage is also emitted as one JSON line on the ``fatigue.timing`` logger.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("fatigue.timing")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    """Current resident set size (peak RSS where /proc is not available, None where neither is)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        if resource is None:
+            return None
+        # ru_maxrss is KiB on Linux, bytes on macOS; only deltas are reported
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageTimer:
+    def __init__(self, run_id=None):
+        self.run_id = run_id or f"{time.time():.3f}"
+        self.records = []
+        self._open = None
+
+    def begin(self, name, rows_in=None):
+        """Start timing ``name``, closing the stage still open."""
+        self.end()
+        self._open = {"stage": name, "rows_in": rows_in, "_t0": time.perf_counter(), "_mem0": rss_bytes()}
+
+    def end(self, rows_out=None):
+        if self._open is None:
+            return None
+        record = self._open
+        self._open = None
+        record["seconds"] = time.perf_counter() - record.pop("_t0")
+        mem0, mem1 = record.pop("_mem0"), rss_bytes()
+        record["mem_delta_mb"] = (mem1 - mem0) / 1024 ** 2 if mem0 is not None and mem1 is not None else None
+        record["rows_out"] = rows_out
+        self.records.append(record)
+        logger.info(json.dumps({"run_id": self.run_id, **record}, default=str))
+        return record
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        self.begin(name, rows_in)
+        try:
+            yield self
+        finally:
+            self.end()
+
+    @property
+    def total_seconds(self):
+        return sum(r["seconds"] for r in self.records)
+
+    def to_frame(self):
+        frame = pd.DataFrame(self.records, columns=["stage", "seconds", "rows_in", "rows_out", "mem_delta_mb"])
+        frame = frame.astype({"rows_in": "Int64", "rows_out": "Int64", "mem_delta_mb": "float64"})
+        frame["share_pct"] = frame["seconds"] / self.total_seconds * 100 if self.total_seconds else 0.0
+        return frame
+
+    def to_json_lines(self):
+        return "".join(json.dumps({"run_id": self.run_id, **r}, default=str) + "\n" for r in self.records)
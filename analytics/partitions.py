@@ -0,0 +1,214 @@
+"""Hive-style partitioned copy of the alert store: site/year/month directories.
+
+The store file stays the source of truth; next to it ``alerts.parts/`` holds
+the same rows as uncompressed Feather files under
+``site=<source file>/year=<yyyy>/month=<m>/``. The partition keys live in the
+directory names, so the list of partitions comes from a directory walk and a
+read for some months (or sites) only opens their files, and only the
+requested columns of those. Alerts without a date go to the
+``__HIVE_DEFAULT_PARTITION__`` directories.
+
+The copy is rebuilt whenever the store is reseeded, and ``append_batch``
+adds a batch's rows as new files in the partitions they touch.
+``_meta.json`` records the store version it mirrors, so a stale copy is
+never read. Setting FATIGUE_HISTORY_MONTHS=N keeps it in sync and makes the
+dashboard load only the latest N months (more can be picked in the sidebar).
+
+Usage:
+    python -m analytics.partitions [--months 2024-05 2024-06] [--site "manual fatique.xlsx"] [--columns start operator_name]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from analytics.cache import arrow_safe
+from analytics.ingest import ColumnMap
+from analytics.riskindex import store_version
+from analytics.schema import SCHEMA_VERSION, SOURCE_COLUMN, apply_schema, sort_by_start
+
+# 0 loads the whole store; N > 0 loads the latest N months from the partitioned copy
+HISTORY_MONTHS = int(os.environ.get("FATIGUE_HISTORY_MONTHS", 0))
+PARTITIONING = ds.partitioning(pa.schema([("site", pa.string()), ("year", pa.int16()), ("month", pa.int8())]),
+                               flavor="hive")
+META_FILE = "_meta.json"
+
+
+def partition_root_for(store_path):
+    return os.path.splitext(store_path)[0] + ".parts"
+
+
+def partitions_enabled(store_path):
+    """True when the store keeps a partitioned copy (FATIGUE_HISTORY_MONTHS set or one already built)."""
+    return HISTORY_MONTHS > 0 or os.path.isdir(partition_root_for(store_path))
+
+
+def read_partition_meta(root):
+    """Metadata of a partitioned copy, or None when there is none."""
+    try:
+        with open(os.path.join(root, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(root, store_meta):
+    """True when the copy at ``root`` mirrors the store version in ``store_meta``."""
+    meta = read_partition_meta(root)
+    return (meta is not None and meta.get("schema") == SCHEMA_VERSION
+            and meta.get("store") == store_version(store_meta))
+
+
+def _write_meta(root, meta):
+    tmp_path = os.path.join(root, META_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(root, META_FILE))
+
+
+def _table(df, schema=None):
+    # Partition keys go to the directory names; categoricals share one index width across files
+    table = pa.Table.from_pandas(arrow_safe(df), preserve_index=False).rename_columns(
+        ["site" if name == SOURCE_COLUMN else name for name in df.columns])
+    if schema is not None:
+        return table.select(schema.names).cast(schema)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)),
+                                     table.column(i).cast(pa.dictionary(pa.int32(), field.type.value_type)))
+    return table
+
+
+def _write_files(table, root, basename):
+    ds.write_dataset(table, root, format="ipc", partitioning=PARTITIONING,
+                     basename_template=basename + "-{i}.feather", existing_data_behavior="overwrite_or_ignore",
+                     file_options=ds.IpcFileFormat().make_write_options(compression=None))
+
+
+def write_partitions(df, column_map, store_meta, root):
+    """Rewrite the whole partitioned copy from the store frame (swapped in when complete)."""
+    parent = os.path.dirname(root) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_root = tempfile.mkdtemp(dir=parent, prefix=os.path.basename(root) + ".")
+    try:
+        _write_files(_table(df), tmp_root, "base")
+        _write_meta(tmp_root, {"column_map": column_map._asdict(), "columns": list(df.columns),
+                               "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+                               "schema": SCHEMA_VERSION, "store": store_version(store_meta)})
+        old_root = None
+        if os.path.exists(root):
+            old_root = tmp_root + ".old"
+            os.rename(root, old_root)
+        os.rename(tmp_root, root)
+    except BaseException:
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        raise
+    if old_root is not None:
+        shutil.rmtree(old_root, ignore_errors=True)
+
+
+def add_partitions(df, new_rows, column_map, old_meta, new_meta, root):
+    """Move the copy from store version ``old_meta`` to ``new_meta``.
+
+    Only ``new_rows`` are written, as new files in the partitions they fall in;
+    a copy that does not mirror ``old_meta`` is rewritten from ``df`` instead.
+    """
+    meta = read_partition_meta(root)
+    if not is_current(root, old_meta):
+        write_partitions(df, column_map, new_meta, root)
+        return
+    if len(new_rows):
+        rows = apply_schema(new_rows.reindex(columns=meta["columns"]), column_map)
+        schema = ds.dataset(root, format="ipc", partitioning=PARTITIONING).schema
+        _write_files(_table(rows, schema), root, f"batch-{len(new_meta['batches']):05d}")
+    _write_meta(root, {**meta, "store": store_version(new_meta)})
+
+
+def list_partitions(root):
+    """One row per file: site, year, month, path and bytes, from the directory names only."""
+    rows = []
+    for fragment in ds.dataset(root, format="ipc", partitioning=PARTITIONING).get_fragments():
+        keys = ds.get_partition_keys(fragment.partition_expression)
+        rows.append({"site": keys.get("site"), "year": keys.get("year"), "month": keys.get("month"),
+                     "path": fragment.path, "bytes": os.path.getsize(fragment.path)})
+    return pd.DataFrame(rows, columns=["site", "year", "month", "path", "bytes"])
+
+
+def available_months(listing):
+    """Sorted (year, month) pairs that have data."""
+    dated = listing.dropna(subset=["year", "month"])
+    return sorted({(int(y), int(m)) for y, m in zip(dated["year"], dated["month"])})
+
+
+def latest_months(listing, n):
+    return available_months(listing)[-n:] if n > 0 else available_months(listing)
+
+
+def _filter(months=None, sites=None):
+    expr = None
+    if months is not None:
+        # Each clause names partition keys only, so non-matching directories are never opened
+        expr = ds.scalar(False)
+        for year, month in months:
+            expr = expr | ((ds.field("year") == year) & (ds.field("month") == month))
+    if sites is not None:
+        expr = ds.field("site").isin(list(sites)) if expr is None else expr & ds.field("site").isin(list(sites))
+    return expr
+
+
+def read_partitions(root, months=None, sites=None, columns=None):
+    """Return (frame, ColumnMap) of the given (year, month) pairs and sites (all if None), in start order.
+
+    ``columns`` limits the read to those columns of the store frame.
+    """
+    meta = read_partition_meta(root)
+    if meta is None:
+        raise FileNotFoundError(f"No partitioned store at {root}")
+    column_map = ColumnMap(**meta["column_map"])
+    names = [c for c in meta["columns"] if columns is None or c in columns]
+    dataset = ds.dataset(root, format="ipc", partitioning=PARTITIONING)
+    table = dataset.to_table(columns=["site" if c == SOURCE_COLUMN else c for c in names],
+                             filter=_filter(months, sites))
+    df = table.to_pandas(split_blocks=True).rename(columns={"site": SOURCE_COLUMN})[names]
+    # A filtered read loses the pandas metadata, so nullable integers are restored from the store's dtypes
+    dtypes = {col: meta["dtypes"][col] for col in names if meta["dtypes"][col] not in ("category", str(df[col].dtype))}
+    return sort_by_start(apply_schema(df.astype(dtypes), column_map)), column_map
+
+
+def main():
+    from analytics.store import STORE_FILE, open_store
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=STORE_FILE)
+    parser.add_argument("--months", nargs="+", default=None, help="YYYY-MM months to read (default: the latest one)")
+    parser.add_argument("--site", nargs="+", default=None, help="source files to read (default: all)")
+    parser.add_argument("--columns", nargs="+", default=None, help="columns to read (default: all)")
+    parser.add_argument("--rebuild", action="store_true", help="rewrite the partitioned copy first")
+    args = parser.parse_args()
+
+    root = partition_root_for(args.store)
+    t0 = time.perf_counter()
+    df, column_map, meta = open_store(store_path=args.store)
+    full_sec = time.perf_counter() - t0
+    if args.rebuild or not is_current(root, meta):
+        write_partitions(df, column_map, meta, root)
+    listing = list_partitions(root)
+    print(f"{len(listing)} partition files, {listing['bytes'].sum() / 1e6:.1f} MB in {root}")
+
+    months = [tuple(int(p) for p in m.split("-")) for m in args.months] if args.months else latest_months(listing, 1)
+    t0 = time.perf_counter()
+    part, _ = read_partitions(root, months, args.site, args.columns)
+    part_sec = time.perf_counter() - t0
+    print(f"full store:  {len(df):,} rows in {full_sec:.3f}s")
+    print(f"partitions:  {len(part):,} rows x {part.shape[1]} columns of "
+          f"{', '.join(f'{y}-{m:02d}' for y, m in months)} in {part_sec:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Headless dashboard pipeline: selections, KPIs and chart rollups.
+
+``app.py`` renders these results with Streamlit widgets and Plotly; the same
+functions run without any UI for the benchmark suite and other consumers.
+"""
+import numpy as np
+import pandas as pd
+
+from analytics.cube import SPEED_BUCKET
+
+
+def select(engine, column_map, years=None, months=None, weeks=None, date_range=None,
+           operators=None, shifts=None, hour_range=None):
+    """Apply sidebar-style selections to a FilterEngine (empty/None means All), in sidebar order."""
+    if years:
+        engine.isin("year", years)
+    if months:
+        engine.isin("month", months)
+    if weeks:
+        engine.isin("week", weeks)
+    if date_range:
+        engine.between("date", pd.Timestamp(date_range[0]), pd.Timestamp(date_range[-1]))
+    if operators and column_map.operator:
+        engine.isin(column_map.operator, operators)
+    if shifts and column_map.shift:
+        engine.isin(column_map.shift, shifts)
+    if hour_range:
+        engine.between("hour", hour_range[0], hour_range[1])
+    return engine
+
+
+def kpis(view, column_map):
+    return {
+        "total_alerts": view.total,
+        "operators": view.nunique(column_map.operator) if column_map.operator else None,
+        "equipment": view.nunique(column_map.asset) if column_map.asset else None,
+        "avg_duration_sec": view.mean_duration(),
+        # Operators/equipment are HyperLogLog estimates for large selections
+        "approximate": view.approximate,
+    }
+
+
+def _weekly_shift(view, cm):
+    weekly = view.counts("week", cm.shift).reset_index(name="alerts")
+    weekly["shift_legend"] = weekly[cm.shift].map(lambda x: f"Shift {x}")
+    return weekly
+
+
+def _ranked_frame(view, col, name):
+    ranked = view.ranked(col).reset_index()
+    ranked.columns = [name, "alerts"]
+    return ranked
+
+
+# Data behind each dashboard chart, as consumed by its figure builder
+ROLLUPS = {
+    "risk": lambda view, cm: view.risk_counts(),
+    "hour": lambda view, cm: view.counts("hour").reset_index(name="alerts"),
+    "shift": lambda view, cm: view.counts(cm.shift).reset_index(name="alerts"),
+    "shift_hour": lambda view, cm: view.counts(cm.shift, "hour").reset_index(name="alerts"),
+    "operator": lambda view, cm: _ranked_frame(view, cm.operator, "operator"),
+    "day_of_week": lambda view, cm: view.day_of_week_counts(),
+    "fleet_type": lambda view, cm: _ranked_frame(view, cm.fleet_type, cm.fleet_type),
+    "operator_shift": lambda view, cm: view.counts(cm.operator, cm.shift).reset_index(name="alerts"),
+    "weekly_shift": _weekly_shift,
+    "speed_distribution": lambda view, cm: view.counts(SPEED_BUCKET).reset_index(name="alerts"),
+}
+
+
+def rollup(name, view, column_map):
+    return ROLLUPS[name](view, column_map)
+
+
+def plain(value):
+    """JSON-ready copy of a result: numpy/pandas scalars, Series (as dicts) and frames (as records); NaN becomes None."""
+    if isinstance(value, pd.DataFrame):
+        return [plain(row) for row in value.to_dict("records")]
+    if isinstance(value, pd.Series):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, dict):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        value = value.item()
+    if value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value
@@ -0,0 +1,153 @@
+"""Background refresh of the shared dataset.
+
+A ``DatasetWatcher`` polls the source stamps (workbook + store, or every file
+of FATIGUE_DATA_SOURCES) from a daemon thread. When they change it builds a
+complete ``Dataset`` (frame, filter index, aggregate cube, risk index,
+fatigue episodes) off the request path and swaps it in under a lock, so
+reruns always read a ready snapshot and never pay the reload themselves.
+``build_dataset(history_months=N)`` loads only the latest N months of the
+store, from its partitioned copy; the dashboard passes FATIGUE_HISTORY_MONTHS,
+while the API and report generator load the whole history.
+"""
+import datetime
+import logging
+import os
+import threading
+from typing import Any, NamedTuple
+
+from analytics.cache import source_stamp
+from analytics.cube import AlertCube
+from analytics.episodes import EpisodeSet, episode_set
+from analytics.filters import FilterIndex
+from analytics.ingest import DATA_FILE, ColumnMap
+from analytics.riskindex import RiskIndex, index_path_for, open_risk_index, saved_risk_index
+from analytics.sources import DATA_SOURCES, expand_sources, load_sources, sources_stamp
+from analytics.store import STORE_FILE, open_store, open_store_months
+
+# Seconds between two looks at the data source
+POLL_SECONDS = float(os.environ.get("FATIGUE_REFRESH_SECONDS", 10))
+
+logger = logging.getLogger("fatigue.refresh")
+
+
+class Dataset(NamedTuple):
+    """Everything a rerun needs for one version of the data, built once and shared read-only."""
+    version: Any
+    df: Any
+    column_map: ColumnMap
+    index: FilterIndex
+    cube: AlertCube
+    risk_index: RiskIndex
+    episodes: EpisodeSet  # at the default EPISODE_GAP_SEC
+    loaded_at: datetime.datetime
+    partitions: Any = None  # partition listing when loaded by month, else None
+    months: tuple = None  # the (year, month) pairs loaded, None for the whole history
+
+
+def current_version(sources=DATA_SOURCES, workbook=DATA_FILE, store_path=STORE_FILE):
+    """Cheap stamp of the data source; changes whenever it is replaced or a batch is appended."""
+    if sources:
+        return (sources_stamp(expand_sources(sources)), None)
+    return (source_stamp(workbook), source_stamp(store_path))
+
+
+def build_dataset(sources=DATA_SOURCES, workbook=DATA_FILE, store_path=STORE_FILE, months=None, history_months=0):
+    """Load the data and build the shared indexes for it.
+
+    ``months`` (or the latest ``history_months``) loads only those months of the store.
+    """
+    version = current_version(sources, workbook, store_path)
+    listing = None
+    if sources:
+        df, column_map = load_sources(expand_sources(sources))
+        store_meta = None
+    elif months or history_months > 0:
+        df, column_map, store_meta, listing, months = open_store_months(months, workbook, store_path, history_months)
+    else:
+        df, column_map, store_meta = open_store(workbook, store_path)
+
+    index = FilterIndex(df)
+    # Warm the sidebar filter codes so the first rerun on this version doesn't build them
+    for col in ["year", "month", "week", "date", column_map.operator, column_map.shift, "hour"]:
+        if col and col in df.columns:
+            index.codes(col)
+    index.time_index()
+    cube = AlertCube(df, column_map)
+    risk_index = _risk_index(df, column_map, store_meta, listing is not None, workbook, store_path)
+    episodes = episode_set(df, column_map)
+
+    # Seeding the store rewrites it; stamp after the load so that write is not seen as a change
+    after = current_version(sources, workbook, store_path)
+    if store_meta is not None and after[0] == version[0]:
+        version = after
+    return Dataset(version, df, column_map, index, cube, risk_index, episodes, datetime.datetime.now(),
+                   listing, months)
+
+
+def _risk_index(df, column_map, store_meta, partial, workbook, store_path):
+    # The index covers the whole history: a frame of only some months must never build or save it
+    path = index_path_for(store_path)
+    if partial:
+        index = saved_risk_index(path, store_meta)
+        if index is not None:
+            return index
+        df, column_map, store_meta = open_store(workbook, store_path)
+    return open_risk_index(df, column_map, store_meta, path)
+
+
+class DatasetWatcher:
+    """Holds the current Dataset and rebuilds it in a daemon thread when the source changes."""
+
+    def __init__(self, build=build_dataset, version=current_version, interval=POLL_SECONDS):
+        self._build = build
+        self._version = version
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._dataset = None
+        self.last_error = None
+
+    def start(self):
+        """Build the first dataset in the caller (errors propagate), then start watching."""
+        self.refresh()
+        if self.last_error is not None:
+            raise self.last_error
+        self._thread = threading.Thread(target=self._run, name="fatigue-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def current(self):
+        with self._lock:
+            return self._dataset
+
+    def refresh(self, force=False):
+        """Rebuild now if the source changed (or ``force``); returns True when a new dataset was swapped in."""
+        # One build at a time; a caller arriving mid-build waits and then sees the new version
+        with self._refresh_lock:
+            dataset = self.current()
+            if not force and dataset is not None and self._version() == dataset.version:
+                return False
+            try:
+                fresh = self._build()
+            except Exception as e:
+                # Keep serving the previous dataset; the app shows the error next to "data as of"
+                logger.exception("dataset refresh failed")
+                self.last_error = e
+                return False
+            with self._lock:
+                self._dataset = fresh
+            self.last_error = None
+            logger.info("dataset refreshed: %d alerts", len(fresh.df))
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("watcher poll failed")
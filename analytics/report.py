@@ -0,0 +1,237 @@
+"""Headless batch reports: the dashboard KPIs, trend charts and insight summary as static files.
+
+The dataset, its filter index and the aggregate cube are loaded once; every
+report (one per site x shift x date window) is a selection on that shared
+cube, rendered in a process pool. Each report is written as
+``<name>.html`` (figures embedded, plotly.js shared from one file next to
+them) and ``<name>.json`` (KPIs, insight statistics and summary bullets), and
+``index.json`` lists them all.
+
+Usage:
+    python -m analytics.report [--out reports/] [--days 1 7 30] [--as-of 2024-05-31]
+                               [--by-site] [--by-shift] [--episodes] [--workers 8]
+"""
+import argparse
+import datetime
+import html
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+import pandas as pd
+import plotly.express as px
+from plotly.offline import get_plotlyjs
+
+from analytics.cube import SPEED_BUCKET
+from analytics.filters import FilterEngine
+from analytics.insights import compute_insights, summary_lines
+from analytics.pipeline import kpis, plain, rollup, select
+from analytics.risk import RISK_COLORS
+from analytics.schema import SOURCE_COLUMN
+
+REPORT_DIR = os.environ.get("FATIGUE_REPORT_DIR", "reports")
+PLOTLY_JS = "plotly.min.js"
+
+# Cube shared by the pool workers, set once per process (see _init_worker)
+_cube = None
+
+
+class ReportSpec(NamedTuple):
+    """One report: a site (source file), a shift and the ``days`` days ending at ``end``."""
+    site: Optional[str]
+    shift: Optional[object]
+    days: int
+    end: pd.Timestamp
+
+    @property
+    def start(self):
+        return self.end - pd.Timedelta(days=self.days - 1)
+
+    @property
+    def name(self):
+        site = "all-sites" if self.site is None else os.path.splitext(self.site)[0]
+        shift = "all-shifts" if self.shift is None else f"shift-{self.shift}"
+        stem = f"{site}_{shift}_{self.days}d_{self.end:%Y%m%d}"
+        return re.sub(r"[^A-Za-z0-9_.-]+", "-", stem)
+
+    @property
+    def title(self):
+        site = "All sites" if self.site is None else self.site
+        shift = "all shifts" if self.shift is None else f"Shift {self.shift}"
+        return f"{site} · {shift} · {self.start:%Y-%m-%d} to {self.end:%Y-%m-%d}"
+
+
+def report_specs(cube, days, as_of=None, by_site=False, by_shift=False):
+    """Every (site, shift, window) combination to render; None stands for All."""
+    cells = cube.cells
+    end = pd.Timestamp(as_of) if as_of is not None else cells["date"].max()
+    sites = [None]
+    if by_site and SOURCE_COLUMN in cells.columns:
+        sites += sorted(str(s) for s in cells[SOURCE_COLUMN].dropna().unique())
+    shifts = [None]
+    if by_shift and cube.column_map.shift:
+        shifts += sorted(cells[cube.column_map.shift].dropna().unique())
+    return [ReportSpec(site, shift, d, end) for site in sites for shift in shifts for d in days]
+
+
+def report_view(cube, spec):
+    """CubeView of the cells selected by a ReportSpec."""
+    engine = select(FilterEngine(cube.index), cube.column_map, date_range=(spec.start, spec.end),
+                    shifts=[spec.shift] if spec.shift is not None else None)
+    if spec.site is not None:
+        engine.isin(SOURCE_COLUMN, [spec.site])
+    return cube.view(engine)
+
+
+def report_figures(view, column_map):
+    """The dashboard's summary charts for one selection, by name."""
+    cm = column_map
+    figures = {}
+    if cm.speed:
+        risk = rollup("risk", view, cm)
+        figures["risk"] = px.bar(x=risk.index, y=risk.values, color=risk.index, color_discrete_map=RISK_COLORS,
+                                 title="Fatigue Risk Categories Distribution",
+                                 labels={"x": "Risk Category", "y": "Number of Alerts"})
+    figures["hour"] = px.bar(rollup("hour", view, cm), x="hour", y="alerts", title="Fatigue Alerts by Hour")
+    if cm.shift:
+        fig = px.bar(rollup("shift", view, cm), x=cm.shift, y="alerts", title="Fatigue Distribution by Shift")
+        figures["shift"] = fig.update_xaxes(type="category")
+        fig = px.density_heatmap(rollup("shift_hour", view, cm), x="hour", y=cm.shift, z="alerts",
+                                 title="Heatmap Fatigue by Shift & Hour", color_continuous_scale="reds")
+        figures["shift_hour_heatmap"] = fig.update_yaxes(type="category")
+        weekly = rollup("weekly_shift", view, cm)
+        # Same colors as the dashboard: first shift blue, second red, any others spread over the hue wheel
+        shifts = sorted(weekly["shift_legend"].unique())
+        colors = {s: ["blue", "red"][i] if i < 2 else f"hsl({i * 60}, 70%, 50%)" for i, s in enumerate(shifts)}
+        fig = px.line(weekly, x="week", y="alerts", color="shift_legend", color_discrete_map=colors, markers=True,
+                      title="Weekly Fatigue Trend by Shift (Recovery Pattern)")
+        figures["weekly_shift"] = fig.update_layout(
+            legend_title_text="Shift", legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    if cm.operator:
+        figures["operator"] = px.bar(rollup("operator", view, cm).head(20), x="operator", y="alerts",
+                                     title="Top Fatigue Alerts by Operator")
+    day_counts = rollup("day_of_week", view, cm)
+    figures["day_of_week"] = px.bar(x=day_counts.index, y=day_counts.values,
+                                    title="Fatigue Alerts by Day of Week (Workload Pattern)")
+    if cm.speed:
+        figures["speed_distribution"] = px.histogram(
+            rollup("speed_distribution", view, cm), x=SPEED_BUCKET, y="alerts", histfunc="sum", nbins=20,
+            title="Speed Distribution (Task Complexity Indicator)", labels={SPEED_BUCKET: cm.speed, "alerts": "count"})
+    return figures
+
+
+def report_metrics(spec, view, column_map, unit="alerts"):
+    """JSON-ready KPIs, insight statistics and summary bullets of one report."""
+    ins = compute_insights(view, column_map)
+    stats = plain(ins._asdict())
+    stats.update(critical_pct=ins.critical_pct, high_speed_pct=ins.high_speed_pct)
+    return {
+        "name": spec.name,
+        "site": spec.site,
+        "shift": plain(spec.shift),
+        "start": f"{spec.start:%Y-%m-%d}",
+        "end": f"{spec.end:%Y-%m-%d}",
+        "unit": unit,
+        "kpis": plain(kpis(view, column_map)),
+        "insights": stats,
+        "summary": summary_lines(ins),
+    }
+
+
+def render_html(spec, metrics, figures):
+    title = html.escape(spec.title)
+    kpi = metrics["kpis"]
+    unit = metrics["unit"].capitalize()
+    avg = kpi["avg_duration_sec"]
+    # "-" only for a missing column (a real 0 is shown); sketch estimates are marked with ≈ as in the app
+    count = lambda n: "-" if n is None else f"≈{n:,}" if kpi.get("approximate") else f"{n:,}"
+    cards = [(f"Total {unit}", f"{kpi['total_alerts']:,}"), ("Operators", count(kpi["operators"])),
+             ("Qty Equipment", count(kpi["equipment"])), ("Avg Duration (sec)", "N/A" if avg is None else round(avg, 2))]
+    summary = "".join(f"<li>{_markdown_bold(line)}</li>" for line in metrics["summary"]) or "<li>No alerts in this selection.</li>"
+    charts = "".join(fig.to_html(full_html=False, include_plotlyjs=False) for fig in figures.values())
+    return (
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title>"
+        f"<script src='{PLOTLY_JS}'></script>"
+        "<style>body{font-family:sans-serif;margin:2em}.kpis{display:flex;gap:2em}"
+        ".kpi b{display:block;font-size:1.6em}</style></head><body>"
+        f"<h1>Fatigue Safety Report</h1><h3>{title}</h3>"
+        "<div class='kpis'>" + "".join(f"<div class='kpi'>{label}<b>{value}</b></div>" for label, value in cards) + "</div>"
+        f"<h2>Automated Insight Summary</h2><ul>{summary}</ul>{charts}"
+        f"<p><small>Generated {datetime.datetime.now():%Y-%m-%d %H:%M}</small></p></body></html>"
+    )
+
+
+def _markdown_bold(line):
+    return re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", html.escape(line))
+
+
+def write_report(spec, cube, out_dir, unit="alerts"):
+    """Render one report to ``out_dir``; returns its metrics."""
+    view = report_view(cube, spec)
+    metrics = report_metrics(spec, view, cube.column_map, unit)
+    page = render_html(spec, metrics, report_figures(view, cube.column_map))
+    with open(os.path.join(out_dir, spec.name + ".html"), "w", encoding="utf-8") as f:
+        f.write(page)
+    with open(os.path.join(out_dir, spec.name + ".json"), "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    return metrics
+
+
+def _init_worker(cube):
+    global _cube
+    _cube = cube
+
+
+def _write_task(task):
+    spec, out_dir, unit = task
+    return write_report(spec, _cube, out_dir, unit)
+
+
+def write_reports(cube, specs, out_dir=REPORT_DIR, max_workers=None, unit="alerts"):
+    """Render every spec from one shared cube, in a process pool; returns their metrics in spec order."""
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, PLOTLY_JS), "w", encoding="utf-8") as f:
+        f.write(get_plotlyjs())
+
+    tasks = [(spec, out_dir, unit) for spec in specs]
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        # The cube goes to each worker once, not once per report
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cube,)) as pool:
+            results = list(pool.map(_write_task, tasks))
+    else:
+        results = [write_report(spec, cube, out_dir, unit) for spec in specs]
+
+    index = [{k: m[k] for k in ("name", "site", "shift", "start", "end")} | {"total": m["kpis"]["total_alerts"]}
+             for m in results]
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"generated": f"{datetime.datetime.now():%Y-%m-%dT%H:%M:%S}", "unit": unit, "reports": index},
+                  f, indent=2, ensure_ascii=False)
+    return results
+
+
+def main():
+    from analytics.refresh import build_dataset
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=REPORT_DIR, help=f"output directory (default: {REPORT_DIR})")
+    parser.add_argument("--days", type=int, nargs="+", default=[1], help="window lengths in days (default: 1)")
+    parser.add_argument("--as-of", default=None, help="last day of every window (default: latest alert date)")
+    parser.add_argument("--by-site", action="store_true", help="one report per source file as well as all sites")
+    parser.add_argument("--by-shift", action="store_true", help="one report per shift as well as all shifts")
+    parser.add_argument("--episodes", action="store_true", help="count fatigue episodes instead of alerts")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    # One load for every report: the store (or FATIGUE_DATA_SOURCES), its index and cube
+    dataset = build_dataset()
+    cube = dataset.episodes.cube if args.episodes else dataset.cube
+    specs = report_specs(cube, args.days, args.as_of, args.by_site, args.by_shift)
+    results = write_reports(cube, specs, args.out, args.workers, "episodes" if args.episodes else "alerts")
+    print(f"{len(results)} reports written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Fatigue risk categorization based on the sidebar risk matrix."""
+import numpy as np
+import pandas as pd
+
+# Circadian low period used across the dashboard
+CRITICAL_HOURS = [2, 3, 4, 5]
+RISK_LEVELS = ['Critical', 'High', 'Medium', 'Low']
+RISK_COLORS = {'Critical': 'red', 'High': 'orange', 'Medium': 'yellow', 'Low': 'green'}
+
+
+def speed_quartiles(speed):
+    """Return the (q25, q50, q75) speed thresholds, NaN-skipping like Series.quantile."""
+    q = pd.Series(speed, dtype="float64").quantile([0.25, 0.5, 0.75])
+    return float(q.iloc[0]), float(q.iloc[1]), float(q.iloc[2])
+
+
+def categorize_risk(speed, hour, quartiles=None):
+    """Assign a risk tier to every alert.
+
+    Same rules as the original row-wise lambda, but the quartiles are computed
+    once and the tiers are picked with array operations:
+
+    - Critical: speed > q75 during critical hours
+    - High:     speed > q50 during critical hours
+    - Medium:   speed > q25 during critical hours
+    - Low:      speed <= q25 outside critical hours
+    - Medium:   everything else (including missing speed)
+    """
+    index = speed.index if isinstance(speed, pd.Series) else None
+    s = pd.Series(speed).to_numpy(dtype="float64", na_value=np.nan)
+    h = pd.Series(hour).to_numpy(dtype="float64", na_value=np.nan)
+    q25, q50, q75 = quartiles if quartiles is not None else speed_quartiles(s)
+
+    critical = np.isin(h, CRITICAL_HOURS)
+    conditions = [
+        (s > q75) & critical,
+        (s > q50) & critical,
+        (s > q25) & critical,
+        (s <= q25) & ~critical,
+    ]
+    labels = np.select(conditions, ['Critical', 'High', 'Medium', 'Low'], default='Medium')
+    return pd.Series(labels, index=index, dtype=object, name='risk_category')
+
+
+def count_risk_tiers(categories):
+    """Alerts per tier in Critical/High/Medium/Low order."""
+    return pd.Series(categories).value_counts().reindex(RISK_LEVELS)
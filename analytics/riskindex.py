@@ -0,0 +1,222 @@
+"""Per-operator rolling fatigue-risk index (7/14/30-day windows).
+
+Every alert gets a score: one point, plus extra weight when it falls in the
+2-5 AM circadian low, when it is a high-speed alert and for its duration.
+Scores are kept as an operator x day matrix, so a window ranking is a slice
+sum over the last N days, and a new batch only adds its own rows. The matrix
+is persisted next to the alert store and updated by ``append_batch``.
+
+Usage:
+    python -m analytics.riskindex [--window 14] [--top 20]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from analytics.cache import read_frame, read_meta, write_frame
+from analytics.risk import CRITICAL_HOURS
+
+WINDOWS = (7, 14, 30)
+# Score of one alert: ALERT + CRITICAL_HOUR (2-5 AM) + HIGH_SPEED (top quartile speed)
+# + DURATION_PER_MIN per minute of event, counted up to DURATION_CAP_MIN minutes
+WEIGHTS = {"alert": 1.0, "critical_hour": 1.0, "high_speed": 1.0, "duration_per_min": 0.25, "duration_cap_min": 10}
+COUNTS = ["score", "alerts", "critical_alerts", "high_speed_alerts"]
+
+
+def index_path_for(store_path):
+    return os.path.splitext(store_path)[0] + ".risk_index.feather"
+
+
+def store_version(store_meta):
+    return {"base_key": store_meta.get("base_key"), "batches": store_meta.get("batches", [])}
+
+
+def _day_numbers(dates):
+    return pd.to_datetime(dates).to_numpy().astype("datetime64[D]").astype("int64")
+
+
+class RiskIndex:
+    """Operator x day totals of alert scores and counts, extendable batch by batch."""
+
+    def __init__(self, column_map, speed_threshold=np.nan, weights=None):
+        self.column_map = column_map
+        # Fixed when the index is built, so appended alerts are scored like the existing ones
+        self.speed_threshold = speed_threshold
+        self.weights = {**WEIGHTS, **(weights or {})}
+        self.operators = pd.Index([], dtype=object)
+        self.first_day = None
+        self.totals = {name: np.zeros((0, 0)) for name in COUNTS}
+
+    @classmethod
+    def build(cls, df, column_map, weights=None):
+        threshold = np.nan
+        if column_map.speed:
+            threshold = pd.to_numeric(df[column_map.speed], errors="coerce").quantile(0.75)
+        index = cls(column_map, threshold, weights)
+        index.update(df)
+        return index
+
+    def score(self, df):
+        """Per-alert score and flags, as a frame of COUNTS columns."""
+        w = self.weights
+        critical = df["hour"].isin(CRITICAL_HOURS).to_numpy()
+        high_speed = np.zeros(len(df), dtype=bool)
+        if self.column_map.speed and not np.isnan(self.speed_threshold):
+            speed = pd.to_numeric(df[self.column_map.speed], errors="coerce").to_numpy(dtype="float64")
+            high_speed = speed >= self.speed_threshold
+        minutes = np.clip(df["duration_sec"].to_numpy(dtype="float64", na_value=np.nan) / 60, 0, w["duration_cap_min"])
+        score = (w["alert"] + w["critical_hour"] * critical + w["high_speed"] * high_speed
+                 + w["duration_per_min"] * np.nan_to_num(minutes))
+        return pd.DataFrame({"score": score, "alerts": 1.0, "critical_alerts": critical.astype(float),
+                             "high_speed_alerts": high_speed.astype(float)}, index=df.index)
+
+    def _grow(self, operators, first_day, last_day):
+        # New operators append rows; days before/after the current span pad columns
+        new_ops = operators.difference(self.operators)
+        if self.first_day is None:
+            self.first_day = first_day
+        n_days = self.totals["score"].shape[1]
+        left = max(self.first_day - first_day, 0)
+        right = max(last_day - (self.first_day + n_days - 1), 0)
+        if len(new_ops) or left or right:
+            pad = ((0, len(new_ops)), (left, right))
+            self.totals = {name: np.pad(arr, pad) for name, arr in self.totals.items()}
+            self.operators = self.operators.append(pd.Index(new_ops, dtype=object))
+            self.first_day -= left
+
+    def update(self, rows):
+        """Add newly arrived alerts; only these rows are scored."""
+        operator = self.column_map.operator
+        if not operator or rows.empty:
+            return self
+        rows = rows[rows[operator].notna() & rows["date"].notna()]
+        if rows.empty:
+            return self
+        names = rows[operator].astype(str).to_numpy()
+        days = _day_numbers(rows["date"])
+        self._grow(pd.Index(np.unique(names), dtype=object), int(days.min()), int(days.max()))
+
+        op_codes = self.operators.get_indexer(names)
+        day_codes = days - self.first_day
+        scored = self.score(rows)
+        for name in COUNTS:
+            np.add.at(self.totals[name], (op_codes, day_codes), scored[name].to_numpy())
+        return self
+
+    @property
+    def last_date(self):
+        if self.first_day is None:
+            return None
+        return pd.Timestamp(np.datetime64(self.first_day + self.totals["score"].shape[1] - 1, "D"))
+
+    def window(self, days, as_of=None, operators=None):
+        """Operators ranked by risk index over the ``days`` days ending at ``as_of`` (default: latest day)."""
+        columns = ["operator", "risk_index"] + COUNTS[1:]
+        if self.first_day is None:
+            return pd.DataFrame(columns=columns)
+        end = _day_numbers([as_of])[0] if as_of is not None else self.first_day + self.totals["score"].shape[1] - 1
+        lo = max(end - days + 1 - self.first_day, 0)
+        hi = max(end + 1 - self.first_day, 0)
+        sums = {name: arr[:, lo:hi].sum(axis=1) for name, arr in self.totals.items()}
+        ranked = pd.DataFrame({"operator": self.operators, "risk_index": sums["score"],
+                               **{name: sums[name].astype("int64") for name in COUNTS[1:]}})
+        ranked = ranked[ranked["alerts"] > 0]
+        if operators:
+            ranked = ranked[ranked["operator"].isin([str(o) for o in operators])]
+        # Name breaks ties so a loaded index ranks exactly like a freshly built one
+        return ranked.sort_values(["risk_index", "operator"], ascending=[False, True], kind="stable").reset_index(drop=True)
+
+    def to_frame(self):
+        """Long (operator, day, COUNTS) form of the non-empty cells."""
+        op_codes, day_codes = np.nonzero(self.totals["alerts"])
+        return pd.DataFrame({
+            "operator": self.operators[op_codes],
+            "day": (day_codes + (self.first_day or 0)).astype("datetime64[D]").astype("datetime64[ns]"),
+            **{name: arr[op_codes, day_codes] for name, arr in self.totals.items()},
+        })
+
+    def save(self, path, extra_meta=None):
+        meta = {"speed_threshold": None if np.isnan(self.speed_threshold) else self.speed_threshold,
+                "weights": self.weights, **(extra_meta or {})}
+        write_frame(self.to_frame(), self.column_map, path, meta)
+
+    @classmethod
+    def load(cls, path):
+        """Return (RiskIndex, metadata) from a saved index."""
+        cells, column_map, meta = read_frame(path)
+        threshold = meta.get("speed_threshold")
+        index = cls(column_map, np.nan if threshold is None else threshold, meta.get("weights"))
+        if len(cells):
+            days = _day_numbers(cells["day"])
+            index._grow(pd.Index(pd.unique(cells["operator"]), dtype=object), int(days.min()), int(days.max()))
+            op_codes = index.operators.get_indexer(cells["operator"])
+            for name in COUNTS:
+                index.totals[name][op_codes, days - index.first_day] = cells[name].to_numpy()
+        return index, meta
+
+
+def _load_version(path, version):
+    # Saved index if it was built for this store version, else None
+    if not os.path.exists(path):
+        return None
+    try:
+        index, meta = RiskIndex.load(path)
+    except (OSError, KeyError, ValueError):
+        return None
+    return index if meta.get("store") == version else None
+
+
+def risk_index_current(path, store_meta):
+    """True when the index saved at ``path`` was built for the store version in ``store_meta``."""
+    try:
+        return read_meta(path).get("store") == store_version(store_meta)
+    except (OSError, KeyError, ValueError):
+        return False
+
+
+def saved_risk_index(path, store_meta):
+    """Index saved at ``path`` when it was built for the store version in ``store_meta``, else None."""
+    return _load_version(path, store_version(store_meta))
+
+
+def open_risk_index(df, column_map, store_meta=None, path=None):
+    """Saved index when it matches the store version in ``store_meta``, else rebuilt from ``df`` (and saved)."""
+    if store_meta is None or path is None:
+        return RiskIndex.build(df, column_map)
+    version = store_version(store_meta)
+    index = _load_version(path, version)
+    if index is None:
+        index = RiskIndex.build(df, column_map)
+        index.save(path, {"store": version})
+    return index
+
+
+def apply_batch(df, new_rows, column_map, old_meta, new_meta, path):
+    """Move a saved index from store version ``old_meta`` to ``new_meta`` by scoring only ``new_rows``."""
+    index = _load_version(path, store_version(old_meta))
+    if index is None:
+        index = RiskIndex.build(df, column_map)
+    else:
+        index.update(new_rows)
+    index.save(path, {"store": store_version(new_meta)})
+    return index
+
+
+def main():
+    from analytics.store import STORE_FILE, open_store
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--window", type=int, default=WINDOWS[0], help="window length in days")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    df, column_map, meta = open_store()
+    index = open_risk_index(df, column_map, meta, index_path_for(STORE_FILE))
+    print(f"{args.window}-day risk index as of {index.last_date:%Y-%m-%d}")
+    print(index.window(args.window).head(args.top).round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
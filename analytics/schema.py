@@ -0,0 +1,102 @@
+"""Compact dtypes for the loaded alert frame, and a memory report.
+
+Every Streamlit session holds filtered copies of this frame, so the string
+dimensions are stored as categoricals, the calendar parts as small (nullable)
+integers and the day as a real datetime64 column instead of Python
+``datetime.date`` objects.
+
+Usage:
+    python -m analytics.schema ["manual fatique.xlsx"]
+"""
+import sys
+
+import pandas as pd
+
+# Bump when the typed layout changes so on-disk caches are rebuilt
+SCHEMA_VERSION = 4
+
+CALENDAR_DTYPES = {
+    "hour": "Int8",
+    "week": "Int8",
+    "month": "Int8",
+    "year": "Int16",
+}
+CATEGORY_COLUMNS = ["day_of_week"]
+# Workbook or batch each stored alert came from (the "site" of reports and partitions)
+SOURCE_COLUMN = "source_file"
+# Columns derived from the timestamps, read by the filters, charts and indexes
+DERIVED_COLUMNS = ["start", "end", "duration_sec", "hour", "date", "day_of_week", "week", "month", "year"]
+
+
+def dashboard_columns(column_map):
+    """Columns the dashboard reads: the detected ones, the derived time columns and the source file."""
+    return [c for c in column_map if c] + DERIVED_COLUMNS + [SOURCE_COLUMN]
+
+
+def apply_schema(df, column_map):
+    """Cast the dashboard columns in place to the compact schema and return the frame.
+
+    Columns already in the target dtype are left alone, so re-applying it to a
+    frame read back from the cache is cheap.
+    """
+    for col in dict.fromkeys([column_map.operator, column_map.asset, column_map.fleet_type] + CATEGORY_COLUMNS):
+        if not col or col not in df.columns:
+            continue
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+        elif not df[col].cat.categories.is_monotonic_increasing:
+            # Categories grown block by block (streaming ingest) are put back in sorted order
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+    for col, dtype in CALENDAR_DTYPES.items():
+        if col in df.columns and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    if "date" in df.columns and df["date"].dtype != "datetime64[ns]":
+        df["date"] = pd.to_datetime(df["date"]).dt.normalize().astype("datetime64[ns]")
+    return df
+
+
+def lost_datetime_columns(parts, merged):
+    """Columns that are datetimes in one of ``parts`` but not in ``merged`` (text mixed into timestamps)."""
+    return sorted({col for part in parts for col in part.columns
+                   if pd.api.types.is_datetime64_any_dtype(part[col]) and col in merged.columns
+                   and not pd.api.types.is_datetime64_any_dtype(merged[col])})
+
+
+def sort_by_start(df):
+    """Rows in ``start`` order (missing starts last), the layout the filter time index slices."""
+    if "start" not in df.columns:
+        return df
+    start = df["start"]
+    n = int(start.notna().sum())
+    if start.iloc[:n].notna().all() and start.iloc[:n].is_monotonic_increasing:
+        return df
+    return df.sort_values("start", kind="stable", na_position="last", ignore_index=True)
+
+
+def memory_report(before, after):
+    """Deep memory use per column before and after, in KiB, with a total row."""
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        # Columns the schema profile does not read show as skipped
+        "dtype_after": after.dtypes.reindex(before.columns).astype(str).replace("nan", "(skipped)"),
+        "kib_before": before.memory_usage(deep=True, index=False) / 1024,
+        "kib_after": after.memory_usage(deep=True, index=False).reindex(before.columns).fillna(0) / 1024,
+    })
+    report.loc["TOTAL"] = ["", "", report["kib_before"].sum(), report["kib_after"].sum()]
+    report["saved_pct"] = (1 - report["kib_after"] / report["kib_before"]) * 100
+    return report.round(1)
+
+
+def main():
+    from analytics.ingest import DATA_FILE, derive_time_columns, detect_columns, load_workbook, normalize_column_names, read_workbook
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+    # Before: every column as pandas reads it; after: the profile's columns with the compact schema
+    raw = normalize_column_names(read_workbook(path))
+    before = derive_time_columns(raw, detect_columns(raw.columns))
+    after, _ = load_workbook(path)
+    print(memory_report(before, after).to_string())
+
+
+if __name__ == "__main__":
+    main()
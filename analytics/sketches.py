@@ -0,0 +1,110 @@
+"""Mergeable per-partition sketches for speed quantiles and distinct counts.
+
+Every (date, shift) partition of the aggregate cube keeps
+
+* a speed histogram over the cube's speed buckets. Speeds are already
+  bucketed (1 km/h by default), so the histogram is an exact, fixed-size
+  quantile sketch; merged histograms give the same quantiles as the cells.
+* a HyperLogLog register array per distinct-count column (operator, asset).
+  Registers merge with an element-wise max, and the estimate has about
+  1.04 / sqrt(2**HLL_PRECISION) relative error (1.6% at precision 12).
+
+A selection that only filters on partition columns (year, month, week, day of
+week, date, shift) is answered by merging its partitions instead of scanning
+every selected cell. ``AlertCube.view`` does this for selections of at least
+FATIGUE_SKETCH_MIN_ALERTS alerts; smaller ones stay exact.
+"""
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from analytics.filters import FilterIndex
+
+HLL_PRECISION = 12
+# Selections with fewer alerts are computed exactly from the cells
+SKETCH_MIN_ALERTS = int(os.environ.get("FATIGUE_SKETCH_MIN_ALERTS", 250_000))
+CALENDAR_COLUMNS = ("year", "month", "week", "day_of_week")
+
+
+def hll_registers(groups, keys, n_groups, precision=HLL_PRECISION):
+    """HyperLogLog registers (n_groups x 2**precision, uint8) of integer ``keys`` per group number."""
+    m = 1 << precision
+    registers = np.zeros(n_groups * m, dtype=np.uint8)
+    if len(keys):
+        h = pd.util.hash_array(np.asarray(keys, dtype=np.int64)).astype(np.uint64)
+        bucket = (h >> np.uint64(64 - precision)).astype(np.int64)
+        rest = h & np.uint64((1 << (64 - precision)) - 1)
+        # Rank = leading zeros of the remaining bits + 1; frexp's exponent is the bit length (exact below 2**53)
+        rank = (64 - precision) - np.frexp(rest.astype(np.float64))[1] + 1
+        np.maximum.at(registers, np.asarray(groups, dtype=np.int64) * m + bucket, rank.astype(np.uint8))
+    return registers.reshape(n_groups, m)
+
+
+def hll_estimate(registers):
+    """Distinct-count estimate of one (merged) register array."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        # Small-range correction (linear counting)
+        estimate = m * np.log(m / zeros)
+    return estimate
+
+
+class MergedSketch(NamedTuple):
+    """Sketch of one selection: speed histogram and distinct-count estimates."""
+    speed_values: np.ndarray
+    speed_counts: np.ndarray
+    distinct: dict  # column -> estimated number of distinct values
+
+
+class PartitionSketches:
+    """Speed histograms and HLL registers per (date, shift) partition of a cube's cells."""
+
+    def __init__(self, cells, column_map, speed_column, precision=HLL_PRECISION):
+        keys = ["date"] + ([column_map.shift] if column_map.shift else [])
+        live = cells[cells["alerts"] > 0]
+        grouped = live.groupby(keys, observed=True, sort=False, dropna=False)
+        part_codes = grouped.ngroup().to_numpy()
+        self.partitions = grouped.size().reset_index()[keys]
+        day = pd.to_datetime(self.partitions["date"])
+        self.partitions["year"] = day.dt.year
+        self.partitions["month"] = day.dt.month
+        self.partitions["week"] = day.dt.isocalendar().week
+        self.partitions["day_of_week"] = day.dt.day_name()
+        self.index = FilterIndex(self.partitions)
+        self.columns = set(keys) | set(CALENDAR_COLUMNS)
+        n = len(self.partitions)
+        alerts = live["alerts"].to_numpy(dtype=np.int64)
+
+        # Speed histogram: partitions x distinct bucket values (missing speeds left out, as in the quantiles)
+        speed = live[speed_column].to_numpy(dtype="float64")
+        known = ~np.isnan(speed)
+        self.speed_values, speed_codes = np.unique(speed[known], return_inverse=True)
+        self.speed_counts = np.zeros((n, len(self.speed_values)), dtype=np.int64)
+        np.add.at(self.speed_counts, (part_codes[known], speed_codes), alerts[known])
+
+        self.registers = {}
+        for col in dict.fromkeys((column_map.operator, column_map.asset)):
+            if not col:
+                continue
+            codes = pd.factorize(live[col])[0]
+            present = codes >= 0
+            base = int(codes.max(initial=0)) + 1
+            # One (partition, value) pair per distinct value before hashing
+            pairs = pd.unique(part_codes[present].astype(np.int64) * base + codes[present])
+            self.registers[col] = hll_registers(pairs // base, pairs % base, n, precision)
+
+    def covers(self, engine):
+        """True when every selection recorded on ``engine`` is on a partition column."""
+        return engine is None or all(col in self.columns for _, col, _ in engine.selections)
+
+    def merge(self, engine=None):
+        """MergedSketch of the partitions an engine's selections keep (all partitions if None)."""
+        keep = np.ones(len(self.partitions), dtype=bool) if engine is None else engine.replay(self.index).mask
+        distinct = {col: hll_estimate(reg[keep].max(axis=0)) if keep.any() else 0.0
+                    for col, reg in self.registers.items()}
+        return MergedSketch(self.speed_values, self.speed_counts[keep].sum(axis=0), distinct)
@@ -0,0 +1,153 @@
+"""Multi-file ingest: a directory (or glob) of site exports parsed in parallel.
+
+Every (file, sheet) pair is normalized in its own worker process with the same
+column detection and timestamp derivation as the single workbook. Parsed files
+go to the Feather cache, so only new or replaced exports are parsed again, and
+the merged frame carries a ``source_file`` column.
+
+Usage:
+    python -m analytics.sources exports/ [--workers 8]
+    python -m analytics.sources "exports/site-*.xlsx"
+"""
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+
+from analytics.cache import CACHE_DIR, _remove_stale, cache_path_for, read_frame, source_fingerprint, source_stamp, write_frame
+from analytics.ingest import align_columns, normalize_frame, schema_profile
+from analytics.schema import SOURCE_COLUMN, apply_schema, lost_datetime_columns, sort_by_start
+
+# Directory or glob of exports to load instead of the single workbook (unset = single workbook)
+DATA_SOURCES = os.environ.get("FATIGUE_DATA_SOURCES")
+SOURCE_PATTERNS = ("*.xlsx", "*.csv")
+
+
+def expand_sources(pattern):
+    """Sorted export files matched by a directory or glob pattern."""
+    if os.path.isdir(pattern):
+        paths = [p for ext in SOURCE_PATTERNS for p in glob.glob(os.path.join(pattern, ext))]
+    else:
+        paths = glob.glob(pattern)
+    # "~$name.xlsx" are Excel lock files of workbooks open on someone's desktop
+    return sorted(p for p in paths if os.path.isfile(p) and not os.path.basename(p).startswith("~$"))
+
+
+def sources_stamp(paths):
+    """Cheap stamp of a set of exports; changes when one is added, removed or replaced."""
+    return tuple((os.path.basename(p), source_stamp(p)) for p in paths)
+
+
+def list_sheets(path):
+    if path.lower().endswith(".csv"):
+        return [None]
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+
+def parse_sheet(task):
+    """Worker: read and normalize one (path, sheet); None for an empty sheet."""
+    path, sheet = task
+    if sheet is None:
+        read = lambda **kw: pd.read_csv(path, **kw)
+    else:
+        read = lambda **kw: pd.read_excel(path, sheet_name=sheet, engine="openpyxl", **kw)
+    # Each sheet may have its own layout: read its header, then only the profile's columns
+    profile = schema_profile(list(read(nrows=0).columns))
+    raw = read(usecols=lambda c: c in set(profile.usecols))
+    if raw.empty:
+        return None
+    return normalize_frame(raw, profile)
+
+
+def merge_frames(parts):
+    """Concatenate (frame, ColumnMap) parts onto the first part's column names."""
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return None
+    column_map = parts[0][1]
+    frames = [align_columns(df, part_map, column_map) for df, part_map in parts]
+    # Categoricals with different categories concat to object; re-apply the compact schema
+    merged = apply_schema(pd.concat(frames, ignore_index=True), column_map)
+    # A timestamp column that is text in some export (e.g. a CSV cache written before the raw
+    # time columns were parsed) must not turn into strings in the combined frame and its cache
+    for col in lost_datetime_columns(frames, merged):
+        merged[col] = pd.to_datetime(merged[col], errors="coerce")
+    return merged, column_map
+
+
+def load_sources(paths, max_workers=None, cache_dir=CACHE_DIR):
+    """Return (frame, ColumnMap) for several exports, parsing cache misses in a process pool."""
+    if not paths:
+        raise FileNotFoundError("No .xlsx/.csv exports found")
+
+    parsed = {}
+    misses = []
+    for path in paths:
+        fingerprint = source_fingerprint(path)
+        cache_file = cache_path_for(path, cache_dir, fingerprint)
+        if os.path.exists(cache_file):
+            try:
+                df, column_map, _ = read_frame(cache_file)
+                parsed[path] = (apply_schema(df, column_map), column_map)
+                continue
+            except (OSError, KeyError, ValueError, pa.ArrowException):
+                pass  # corrupt or foreign file: parse again below
+        misses.append((path, fingerprint, cache_file))
+
+    # One task per sheet, so a single large multi-sheet workbook is split across cores too
+    tasks = [(path, sheet) for path, _, _ in misses for sheet in list_sheets(path)]
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_sheet, tasks))
+    else:
+        results = [parse_sheet(task) for task in tasks]
+
+    for path, fingerprint, cache_file in misses:
+        merged = merge_frames([r for (task_path, _), r in zip(tasks, results) if task_path == path])
+        if merged is None:
+            continue
+        write_frame(*merged, cache_file, {"source": fingerprint})
+        # A replaced export leaves its old cache behind otherwise
+        _remove_stale(cache_file)
+        parsed[path] = merged
+
+    parts = []
+    for path in paths:
+        if path in parsed:
+            df, column_map = parsed[path]
+            # Added after the cache so a file's cache is shared with single-workbook mode
+            df = df.assign(**{SOURCE_COLUMN: os.path.basename(path)})
+            parts.append((df, column_map))
+    merged = merge_frames(parts)
+    if merged is None:
+        raise ValueError("All exports are empty")
+    df, column_map = merged
+    df[SOURCE_COLUMN] = df[SOURCE_COLUMN].astype("category")
+    # Start order lets the date/hour filters binary-search the merged frame
+    return sort_by_start(df), column_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pattern", help="directory of exports or a glob such as 'exports/*.xlsx'")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    paths = expand_sources(args.pattern)
+    df, _ = load_sources(paths, args.workers, args.cache_dir)
+    print(f"{len(df)} alerts from {len(paths)} files")
+    print(df[SOURCE_COLUMN].value_counts(sort=False).to_string())
+
+
+if __name__ == "__main__":
+    main()
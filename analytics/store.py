@@ -0,0 +1,227 @@
+"""Append-only alert store: the workbook plus every ingested detection batch.
+
+The store is one Feather file holding the merged, normalized dataset. New
+exports are normalized on their own rows only, de-duplicated on
+(operator, asset, start) and merged in, so history is never re-parsed.
+A site/year/month partitioned copy (analytics.partitions) is kept in step
+when FATIGUE_HISTORY_MONTHS is set.
+
+Usage:
+    python -m analytics.store append new_export.xlsx [--sheet "Week 3"]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+from analytics.cache import CACHE_DIR, cache_key, load_cached, read_frame, read_meta, source_fingerprint, write_frame
+from analytics.ingest import DATA_FILE, ColumnMap, align_columns, normalize_frame
+from analytics.partitions import (HISTORY_MONTHS, add_partitions, is_current, latest_months, list_partitions,
+                                  partition_root_for, partitions_enabled, read_partitions, write_partitions)
+from analytics.riskindex import apply_batch, index_path_for, open_risk_index, risk_index_current
+from analytics.schema import SOURCE_COLUMN, apply_schema, dashboard_columns, lost_datetime_columns, sort_by_start
+
+STORE_FILE = os.path.join(CACHE_DIR, "alerts.feather")
+
+logger = logging.getLogger("fatigue.store")
+
+
+def dedupe_keys(column_map):
+    return [c for c in (column_map.operator, column_map.asset) if c] + ["start"]
+
+
+def _read_source(source, sheet_name=None):
+    """Read a path or uploaded file object; return (raw frame, batch id, display name)."""
+    if hasattr(source, "read"):
+        data = source.read()
+        name = getattr(source, "name", "upload")
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+        name = os.path.basename(source)
+
+    if name.lower().endswith(".csv"):
+        raw = pd.read_csv(io.BytesIO(data))
+    else:
+        raw = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, engine="openpyxl")
+        if isinstance(raw, dict):
+            raw = pd.concat(raw.values(), ignore_index=True)
+    batch_id = hashlib.sha256(data).hexdigest()[:16] + (f":{sheet_name}" if sheet_name is not None else "")
+    return raw, batch_id, name
+
+
+def merge_new_rows(df, batch, keys):
+    """Rows of ``batch`` whose dedupe key is not already in ``df`` (or earlier in the batch)."""
+    batch = batch.drop_duplicates(subset=keys)
+    if df.empty:
+        return batch
+    seen = pd.MultiIndex.from_frame(df[keys])
+    return batch[~pd.MultiIndex.from_frame(batch[keys]).isin(seen)]
+
+
+def _write(df, column_map, meta, store_path):
+    write_frame(df, column_map, store_path, {k: v for k, v in meta.items() if k != "column_map"})
+
+
+@contextlib.contextmanager
+def store_lock(store_path=STORE_FILE):
+    """Exclusive lock (a ``.lock`` file next to the store) held across a read-modify-write of the store."""
+    os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+    with open(store_path + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def open_store(workbook=DATA_FILE, store_path=STORE_FILE):
+    """Return (frame, ColumnMap, meta), (re)seeding the store from the workbook when it changed."""
+    if os.path.exists(store_path):
+        old = read_frame(store_path)
+        if old[2].get("base_key") == cache_key(source_fingerprint(workbook)):
+            return old
+    # The reseed rewrites the store; it must not interleave with an append_batch
+    with store_lock(store_path):
+        return _open_store(workbook, store_path)
+
+
+def _open_store(workbook, store_path):
+    # open_store with the store lock held: seed or reseed it when the workbook changed
+    base_key = cache_key(source_fingerprint(workbook))
+    old = None
+    if os.path.exists(store_path):
+        old = read_frame(store_path)
+        if old[2].get("base_key") == base_key:
+            return old
+
+    base, column_map = load_cached(workbook)
+    base[SOURCE_COLUMN] = os.path.basename(workbook)
+    meta = {"base_key": base_key, "batches": []}
+    if old is not None:
+        # The workbook was replaced: keep the appended batches on top of the new base
+        old_df, _, old_meta = old
+        appended = old_df[old_df[SOURCE_COLUMN] != os.path.basename(workbook)]
+        # Rows kept from an older layout only carry the columns the current profile reads
+        dropped = [c for c in appended.columns if c not in base.columns]
+        if dropped and len(appended):
+            logger.warning("workbook layout changed: %d appended alerts lose column(s) %s",
+                           len(appended), ", ".join(map(str, dropped)))
+        appended = appended.reindex(columns=base.columns)
+        # Stores written before the raw time columns were parsed may hold them as text
+        for col in base.columns:
+            if pd.api.types.is_datetime64_any_dtype(base[col]) and not pd.api.types.is_datetime64_any_dtype(appended[col]):
+                appended[col] = pd.to_datetime(appended[col], errors="coerce")
+        new_rows = merge_new_rows(base, appended, dedupe_keys(column_map))
+        base = apply_schema(pd.concat([base, new_rows], ignore_index=True), column_map)
+        meta["batches"] = old_meta.get("batches", [])
+    # Stored in start order so date/hour filters can binary-search it
+    base = sort_by_start(base)
+    _write(base, column_map, meta, store_path)
+    if partitions_enabled(store_path):
+        write_partitions(base, column_map, meta, partition_root_for(store_path))
+    # Hand out the memory-mapped copy, like every later open
+    return read_frame(store_path)
+
+
+def append_batch(source, sheet_name=None, workbook=DATA_FILE, store_path=STORE_FILE):
+    """Normalize a new export (file path or file object) and merge it into the store.
+
+    Returns the number of alerts added; re-ingesting the same batch adds nothing.
+    """
+    raw, batch_id, name = _read_source(source, sheet_name)
+    batch, batch_map = normalize_frame(raw)
+    # Two sessions uploading at once must not both append to the same store version
+    with store_lock(store_path):
+        return _merge_batch(batch, batch_map, batch_id, name, workbook, store_path)
+
+
+def _merge_batch(batch, batch_map, batch_id, name, workbook, store_path):
+    df, column_map, meta = _open_store(workbook, store_path)
+    if batch_id in meta.get("batches", []):
+        return 0
+
+    # Exports with a slightly different header still land in the store's columns
+    batch = align_columns(batch, batch_map, column_map)
+    batch[SOURCE_COLUMN] = name
+    new_rows = merge_new_rows(df, batch, dedupe_keys(column_map))
+
+    old_meta, meta = meta, {**meta, "batches": meta.get("batches", []) + [batch_id]}
+    if len(new_rows):
+        # Categoricals with different categories concat to object; re-apply the compact schema
+        merged = apply_schema(pd.concat([df, new_rows], ignore_index=True), column_map)
+        lost = lost_datetime_columns([df, new_rows], merged)
+        if lost:
+            # Written out, these would become strings for every stored row
+            raise ValueError(f"{name}: timestamp column(s) {', '.join(lost)} would no longer be datetimes")
+        df = sort_by_start(merged)
+    _write(df, column_map, meta, store_path)
+    # The operator risk index only scores the new rows
+    apply_batch(df, new_rows, column_map, old_meta, meta, index_path_for(store_path))
+    if partitions_enabled(store_path):
+        # So does the partitioned copy: new files in the partitions the batch touches
+        add_partitions(df, new_rows, column_map, old_meta, meta, partition_root_for(store_path))
+    return len(new_rows)
+
+
+def open_store_months(months=None, workbook=DATA_FILE, store_path=STORE_FILE, history_months=HISTORY_MONTHS):
+    """Return (frame, ColumnMap, meta, partition listing, months) reading only the given (year, month) pairs.
+
+    ``months`` defaults to the latest ``history_months``. Only the columns the
+    dashboard uses are read. The full store is only read when it has to be
+    (re)seeded or its partitioned copy or risk index is behind it; otherwise the
+    store is checked from its metadata alone.
+    """
+    root = partition_root_for(store_path)
+    meta = None
+    if os.path.exists(store_path):
+        meta = read_meta(store_path)
+        if meta.get("base_key") != cache_key(source_fingerprint(workbook)):
+            meta = None
+    if meta is None or not is_current(root, meta) or not risk_index_current(index_path_for(store_path), meta):
+        with store_lock(store_path):
+            df, column_map, meta = _open_store(workbook, store_path)
+            if not is_current(root, meta):
+                write_partitions(df, column_map, meta, root)
+            # The risk index covers the whole history, so it is brought up to date from the full frame
+            open_risk_index(df, column_map, meta, index_path_for(store_path))
+    listing = list_partitions(root)
+    months = tuple(months) if months else tuple(latest_months(listing, history_months))
+    df, column_map = read_partitions(root, months, columns=dashboard_columns(ColumnMap(**meta["column_map"])))
+    return df, column_map, meta, listing, months
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    append = sub.add_parser("append", help="merge a new detection export into the store")
+    append.add_argument("source")
+    append.add_argument("--sheet", default=None, help="only ingest this sheet (default: all sheets)")
+    append.add_argument("--workbook", default=DATA_FILE)
+    append.add_argument("--store", default=STORE_FILE)
+    args = parser.parse_args()
+
+    added = append_batch(args.source, args.sheet, args.workbook, args.store)
+    print(f"{added} new alerts merged into {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,28 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import requests
 import json
+import functools
+import os
+import shutil
+import tempfile
+import time
+
+from analytics.cube import SPEED_BUCKET
+from analytics.downsample import MAX_SCATTER_POINTS, MODE_DENSITY, MODE_SAMPLE, binned_density, stratified_sample
+from analytics.episodes import EPISODE_GAP_SEC, episode_set
+from analytics.export import FORMATS as EXPORT_FORMATS, write_export
+from analytics.figcache import FigureCache
+from analytics.filters import FilterEngine
+from analytics.ingest import DATA_FILE
+from analytics.insights import compute_insights, summary_lines
+from analytics.instrument import StageTimer
+from analytics.partitions import HISTORY_MONTHS, available_months
+from analytics.pipeline import kpis, rollup
+from analytics.refresh import DatasetWatcher, build_dataset
+from analytics.risk import RISK_COLORS, categorize_risk
+from analytics.riskindex import WINDOWS as RISK_WINDOWS
+from analytics.sources import DATA_SOURCES
+from analytics.store import append_batch
 
 # =================== CONFIG =====================
 st.set_page_config(
@@ -185,105 +207,138 @@ st.markdown('<div class="main-header"><h1>Safety Analysis and AI - Advanced Fati
 
 
 # =================== LOAD DATA ======================
-@st.cache_data
-def load_data():
-    # Load data from the uploaded file
-    try:
-        df = pd.read_excel('manual fatique.xlsx', sheet_name=None, engine="openpyxl")
-        
-        # If the file has multiple sheets, concatenate them
-        if isinstance(df, dict):
-            df = pd.concat(df.values(), ignore_index=True)
-        
-        df.columns = df.columns.astype(str).str.strip().str.lower().str.replace(" ", "_")
-
-        # auto detect important columns
-        col_operator = next((c for c in df.columns if "operator" in c or "driver" in c), None)
-        col_shift = next((c for c in df.columns if "shift" in c), None)
-        col_asset = next((c for c in df.columns if "asset" in c or "vehicle" in c or "fleet" in c), None)
-        col_fleet_type = next((c for c in df.columns if "parent_fleet" in c), None)
-        col_speed = next((c for c in df.columns if "speed" in c or "km/h" in c), None)
-
-        # detect timestamps (using the actual column names from the provided file)
-        start_time_cols = [c for c in df.columns if "gmt" in c.lower() and "wita" in c.lower()]
-        # Assuming the first one is start and the second is end
-        if len(start_time_cols) >= 2:
-            df["start"] = pd.to_datetime(df[start_time_cols[0]], errors="coerce")
-            df["end"] = pd.to_datetime(df[start_time_cols[1]], errors="coerce")
-        elif len(start_time_cols) == 1:
-            # If only one time column, assume it's start time and set end time to start + 1 minute as a placeholder
-            df["start"] = pd.to_datetime(df[start_time_cols[0]], errors="coerce")
-            df["end"] = df["start"] + pd.Timedelta(minutes=1)
-
-        df["duration_sec"] = (df["end"] - df["start"]).dt.total_seconds()
-        df["hour"] = df["start"].dt.hour
-        df["date"] = df["start"].dt.date # Add date column for filtering
-        df["day_of_week"] = df["start"].dt.day_name() # Add day of week for analysis
-        df["week"] = df["start"].dt.isocalendar().week # Add week for trend analysis
-        df["month"] = df["start"].dt.month # Add month for filtering
-        df["year"] = df["start"].dt.year # Add year for filtering
-
-        # Ensure shift is integer type and handle potential decimal values by rounding
-        if col_shift:
-            # Convert to numeric, then round to nearest integer, then convert to int64 to remove decimals
-            df[col_shift] = pd.to_numeric(df[col_shift], errors='coerce').round().astype('Int64')
-
-        return df, col_operator, col_shift, col_asset, col_fleet_type, col_speed
-    except FileNotFoundError:
+@st.cache_resource
+def get_watcher():
+    """One watcher per server process, holding the dataset every session shares.
+
+    The frame, filter index, cube and risk index of a Dataset are one read-only copy
+    used by all sessions (an st.cache_resource, not a per-session st.cache_data copy),
+    so never mutate them: FilterEngine.apply returns views, and derived columns go on
+    a copy (``df.assign``), as the export does.
+    """
+    # Loads the alert store (or every export of FATIGUE_DATA_SOURCES) once, then rebuilds the
+    # shared dataset in a background thread whenever the source changes.
+    # FATIGUE_HISTORY_MONTHS limits the dashboard (only) to the latest months by default
+    return DatasetWatcher(build=functools.partial(build_dataset, history_months=HISTORY_MONTHS)).start()
+
+
+@st.cache_resource(max_entries=4)
+def get_months_dataset(version, months):
+    # Other months of the partitioned store, built once per (data version, months) and shared like the dataset
+    return build_dataset(months=months)
+
+
+# Per-stage timing of this rerun (shown in the optional performance panel)
+timing = StageTimer()
+timing.begin("load")
+
+try:
+    watcher = get_watcher()
+except FileNotFoundError:
+    if DATA_SOURCES:
+        st.error(f"No exports found in '{DATA_SOURCES}'. Please check FATIGUE_DATA_SOURCES.")
+    else:
         st.error("File 'manual fatique.xlsx' not found. Please check the file path.")
-        return pd.DataFrame(), None, None, None, None, None
-    except Exception as e:
-        st.error(f"Error loading  {e}")
-        return pd.DataFrame(), None, None, None, None, None
-
+    st.stop()
+except Exception as e:
+    st.error(f"Error loading  {e}")
+    st.stop()
 
-df, col_operator, col_shift, col_asset, col_fleet_type, col_speed = load_data()
+# A ready snapshot: frame, filter index, cube and risk index of one data version (read-only, never mutate)
+dataset = watcher.current()
+if dataset.partitions is not None:
+    # FATIGUE_HISTORY_MONTHS: only the picked months are read, from their store partitions
+    loaded_months = st.sidebar.multiselect(
+        "Months loaded",
+        options=available_months(dataset.partitions),
+        default=list(dataset.months),
+        format_func=lambda ym: f"{ym[0]}-{ym[1]:02d}",
+        help="Months of the alert history read from the store; the filters below narrow within them"
+    )
+    if loaded_months and tuple(sorted(loaded_months)) != dataset.months:
+        dataset = get_months_dataset(dataset.version, tuple(sorted(loaded_months)))
+data_version = (dataset.version, dataset.months)
+df = dataset.df
+column_map = dataset.column_map
+col_operator, col_shift, col_asset, col_fleet_type, col_speed = column_map
 
 if df.empty:
     st.stop()
 
+timing.end(rows_out=len(df))
+
+# Data as of: when this snapshot was loaded, and its latest alert
+latest_alert = df["start"].max()
+st.caption(
+    f"Data as of {dataset.loaded_at:%Y-%m-%d %H:%M:%S}"
+    + (f" · latest alert {latest_alert:%Y-%m-%d %H:%M}" if pd.notna(latest_alert) else "")
+)
+if watcher.last_error is not None:
+    st.warning(f"Background refresh failed, showing the previous data: {watcher.last_error}")
+
 st.success("Data Loaded Successfully")
 
+# =================== APPEND NEW ALERT BATCH (Sidebar) =====================
+with st.sidebar.expander("Append New Alert Batch"):
+    if DATA_SOURCES:
+        # Directory mode has no store: new exports dropped into the folder are picked up by the watcher
+        st.caption(f"Loading every export in `{DATA_SOURCES}`; add new exports there.")
+    else:
+        batch_file = st.file_uploader("Detection export (xlsx / csv)", type=["xlsx", "csv"], key="batch_upload")
+        batch_sheet = st.text_input("Sheet name (Leave blank for All)", key="batch_sheet")
+        if batch_file is not None and st.button("Merge into dataset", key="batch_merge"):
+            added = append_batch(batch_file, batch_sheet or None, DATA_FILE)
+            if added:
+                # Swap the merged data in now rather than at the next poll
+                watcher.refresh()
+                st.rerun()
+            else:
+                st.info("No new alerts in this batch (already ingested)")
+
 # =================== FILTERS (Sidebar) =====================
 st.sidebar.header("Filters")
+timing.begin("filters", rows_in=len(df))
+
+# Every filter narrows one combined mask over the shared index; options cascade from the rows still selected
+flt = FilterEngine(dataset.index)
 
 # Year Filter
 if 'year' in df.columns:
-    all_years = sorted(df['year'].dropna().unique())
+    all_years = flt.options('year')
     selected_years = st.sidebar.multiselect(
         "Select Year (Leave blank for All)",
         options=all_years,
         default=all_years  # Default to all if none selected
     )
     if selected_years:
-        df = df[df['year'].isin(selected_years)]
+        flt.isin('year', selected_years)
 
 # Month Filter
 if 'month' in df.columns:
-    all_months = sorted(df['month'].dropna().unique())
+    all_months = flt.options('month')
     selected_months = st.sidebar.multiselect(
         "Select Month (Leave blank for All)",
         options=all_months,
         default=all_months  # Default to all if none selected
     )
     if selected_months:
-        df = df[df['month'].isin(selected_months)]
+        flt.isin('month', selected_months)
 
 # Week Filter
 if 'week' in df.columns:
-    all_weeks = sorted(df['week'].dropna().unique())
+    all_weeks = flt.options('week')
     selected_weeks = st.sidebar.multiselect(
         "Select Week (Leave blank for All)",
         options=all_weeks,
         default=all_weeks  # Default to all if none selected
     )
     if selected_weeks:
-        df = df[df['week'].isin(selected_weeks)]
+        flt.isin('week', selected_weeks)
 
 # Date Range Filter: Default to "All" if no specific range is selected
-if 'date' in df.columns:
-    min_date = df['date'].min()
-    max_date = df['date'].max()
+min_day, max_day = flt.value_range('date') if 'date' in df.columns else (None, None)
+if min_day is not None:
+    min_date, max_date = min_day.date(), max_day.date()
     # Set default value to the full range initially
     date_range_default = (min_date, max_date)
 
@@ -303,12 +358,12 @@ if 'date' in df.columns:
         # If user selected a specific range, use it
         date_range = tuple(date_range_input)
         date_filtered = True
-    # Apply date filter
-    df = df[(df['date'] >= date_range[0]) & (df['date'] <= date_range[1])]
+    # Apply date filter (a single picked day means that day only)
+    flt.between('date', pd.Timestamp(date_range[0]), pd.Timestamp(date_range[-1]))
 
 # Operator Filter (with search functionality)
 if col_operator:
-    all_operators = sorted(df[col_operator].dropna().unique())
+    all_operators = flt.options(col_operator)
     # Use multiselect with search functionality
     selected_operators = st.sidebar.multiselect(
         f"Select {col_operator.replace('_', ' ').title()} (Leave blank for All)",
@@ -317,11 +372,11 @@ if col_operator:
         format_func=lambda x: x  # Format function for better display
     )
     if selected_operators:
-        df = df[df[col_operator].isin(selected_operators)]
+        flt.isin(col_operator, selected_operators)
 
 # Shift Filter (with search functionality) - Ensure integers
 if col_shift:
-    all_shifts = sorted(df[col_shift].dropna().unique())
+    all_shifts = flt.options(col_shift)
     # Use multiselect with search functionality
     selected_shifts = st.sidebar.multiselect(
         f"Select {col_shift.replace('_', ' ').title()} (Leave blank for All)",
@@ -329,10 +384,10 @@ if col_shift:
         default=all_shifts,  # Default to all if none selected
     )
     if selected_shifts:
-        df = df[df[col_shift].isin(selected_shifts)]
+        flt.isin(col_shift, selected_shifts)
 
 # Hour Range Filter
-all_hours = sorted(df['hour'].dropna().unique())
+all_hours = flt.options('hour')
 if len(all_hours) > 0:
     hour_range = st.sidebar.slider(
         "Select Hour Range (Leave at full range for All)",
@@ -342,333 +397,82 @@ if len(all_hours) > 0:
         step=1
     )
     if hour_range != (int(min(all_hours)), int(max(all_hours))):
-        df = df[(df['hour'] >= hour_range[0]) & (df['hour'] <= hour_range[1])]
+        flt.between('hour', hour_range[0], hour_range[1])
 else:
     # Handle case where there are no hours
     st.sidebar.text("No hour data available")
     hour_range = (0, 23)
 
+# Materialize the filtered frame once
+df = flt.apply(df)
+timing.end(rows_out=len(df))
 
-# =================== FATIGUE RISK CATEGORIZATION =====================
-st.subheader("Fatigue Risk Categorization")
-
-# Define risk categories based on the provided matrix
-if col_speed and "hour" in df.columns:
-    # Create risk category column based on the matrix
-    df['risk_category'] = df.apply(lambda row: 
-        'Critical' if (row[col_speed] > df[col_speed].quantile(0.75) and row['hour'] in [2, 3, 4, 5]) else
-        'High' if (row[col_speed] > df[col_speed].quantile(0.5) and row['hour'] in [2, 3, 4, 5]) else
-        'Medium' if (row[col_speed] > df[col_speed].quantile(0.25) and row['hour'] in [2, 3, 4, 5]) else
-        'Low' if (row[col_speed] <= df[col_speed].quantile(0.25) and row['hour'] not in [2, 3, 4, 5]) else
-        'Medium', axis=1)  # Default to medium for other cases
-    
-    # Count alerts by risk category
-    risk_counts = df['risk_category'].value_counts().reindex(['Critical', 'High', 'Medium', 'Low'])
-    
-    # Create a bar chart showing the distribution of risk categories
-    fig_risk = px.bar(
-        x=risk_counts.index,
-        y=risk_counts.values,
-        title="Fatigue Risk Categories Distribution",
-        labels={'x': 'Risk Category', 'y': 'Number of Alerts'},
-        color=risk_counts.index,
-        color_discrete_map={'Critical': 'red', 'High': 'orange', 'Medium': 'yellow', 'Low': 'green'}
+# Large scatter charts are reduced server-side above this many points
+with st.sidebar.expander("Chart Settings"):
+    max_scatter_points = st.number_input(
+        "Max scatter points", min_value=500, max_value=200000, value=MAX_SCATTER_POINTS, step=500
     )
-    fig_risk.update_layout(
-        xaxis_title="Risk Category",
-        yaxis_title="Number of Alerts",
-        height=400
-    )
-    # Add legend to explain each category
-    fig_risk.update_layout(
-        legend_title_text="Risk Level",
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1,
-            xanchor="left",
-            x=1.02
-        )
-    )
-    # Add annotations to explain what each risk level means
-    for i, (cat, count) in enumerate(risk_counts.items()):
-        if cat == 'Critical':
-            fig_risk.add_annotation(
-                x=cat,
-                y=count + 1,
-                text="High fatigue + high-speed haul road",
-                showarrow=False,
-                font=dict(size=10),
-                bgcolor="red",
-                opacity=0.8
-            )
-        elif cat == 'High':
-            fig_risk.add_annotation(
-                x=cat,
-                y=count + 1,
-                text="Moderate fatigue + decline haul road",
-                showarrow=False,
-                font=dict(size=10),
-                bgcolor="orange",
-                opacity=0.8
-            )
-        elif cat == 'Medium':
-            fig_risk.add_annotation(
-                x=cat,
-                y=count + 1,
-                text="High fatigue + low-risk task",
-                showarrow=False,
-                font=dict(size=10),
-                bgcolor="yellow",
-                opacity=0.8
-            )
-        elif cat == 'Low':
-            fig_risk.add_annotation(
-                x=cat,
-                y=count + 1,
-                text="Low fatigue + non-hazard task",
-                showarrow=False,
-                font=dict(size=10),
-                bgcolor="green",
-                opacity=0.8
-            )
-    
-    st.plotly_chart(fig_risk, width="stretch")
-
-
-# =================== KPI METRICS =====================
-st.subheader("Executive Safety Dashboard")
-
-col1, col2, col3, col4 = st.columns(4)
-
-col1.metric("Total Alerts", f"{len(df):,}")
-col2.metric("Operators", df[col_operator].nunique() if col_operator else "-")
-col3.metric("Qty Equipment", df[col_asset].nunique() if col_asset else "-")  # Changed from "Assets" to "Qty Equipment"
-col4.metric("Avg Duration (sec)", round(df["duration_sec"].mean(),2) if "duration_sec" in df.columns else "N/A")
-
-
-# =================== TREND ANALYTICS =====================
-st.subheader("Fatigue Trend Analysis")
-
-# Hourly
-fig_hour = px.bar(
-    df.groupby("hour").size().reset_index(name="alerts"),
-    x="hour", y="alerts",
-    title="Fatigue Alerts by Hour"
-)
-st.plotly_chart(fig_hour, width="stretch")
-
-# Shift-Based
-if col_shift:
-    fig_shift = px.bar(
-        df.groupby(col_shift).size().reset_index(name="alerts"),
-        x=col_shift, y="alerts",
-        title="Fatigue Distribution by Shift"
-    )
-    # Force the x-axis (shift) to be categorical to avoid decimal labels
-    fig_shift.update_xaxes(type='category')
-    st.plotly_chart(fig_shift, width="stretch")
-
-    # hour inside shift heatmap
-    heat_df = df.groupby([col_shift, "hour"]).size().reset_index(name="alerts")
-
-    fig_heat = px.density_heatmap(
-        heat_df,
-        x="hour", y=col_shift, z="alerts",
-        title="Heatmap Fatigue by Shift & Hour",
-        color_continuous_scale="reds"
-    )
-    # Force the y-axis (shift) to be categorical to avoid decimal labels
-    fig_heat.update_yaxes(type='category')
-    st.plotly_chart(fig_heat, width="stretch")
-
-
-# Operator Ranking
-if col_operator:
-    operator_counts = df[col_operator].value_counts().reset_index()
-    operator_counts.columns = ["operator", "alerts"]
-    fig_operator = px.bar(
-        operator_counts,
-        x="operator", y="alerts",
-        title="Top Fatigue Alerts by Operator"
+    scatter_mode = st.radio(
+        "Large scatter rendering", [MODE_SAMPLE, MODE_DENSITY],
+        format_func=lambda m: "Sample (keeps outliers)" if m == MODE_SAMPLE else "Density (hour bins)"
     )
-    st.plotly_chart(fig_operator, width="stretch")
-
-
-# =================== NEW CHARTS (Based on Mining Fatigue Factors) =====================
-st.subheader("Advanced Mining Fatigue Analytics")
-
-# 1. Day of Week Analysis (Workload Pattern)
-if 'day_of_week' in df.columns:
-    day_counts = df['day_of_week'].value_counts().reindex(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
-    fig_day = px.bar(
-        day_counts,
-        x=day_counts.index, y=day_counts.values,
-        title="Fatigue Alerts by Day of Week (Workload Pattern)"
-    )
-    st.plotly_chart(fig_day, width="stretch")
-
-# 2. Fleet Type Analysis (Task & Workload)
-if col_fleet_type:
-    fleet_counts = df[col_fleet_type].value_counts().reset_index()
-    fleet_counts.columns = [col_fleet_type, "alerts"]
-    fig_fleet = px.bar(
-        fleet_counts,
-        x=col_fleet_type, y="alerts",
-        title="Fatigue Alerts by Fleet Type (Task Complexity)"
-    )
-    st.plotly_chart(fig_fleet, width="stretch")
-
-# 3. Speed vs Hour Analysis (Environmental Factors & Workload)
-if col_speed and "hour" in df.columns:
-    # Remove rows with NaN speed values for this analysis
-    speed_df = df.dropna(subset=[col_speed])
-    if not speed_df.empty:
-        fig_speed_hour = px.scatter(
-            speed_df,
-            x="hour", y=col_speed,
-            title="Speed vs Hour of Day (Fatigue Events) - Environmental Factor",
-            hover_data=[col_operator, col_asset]
-        )
-        st.plotly_chart(fig_speed_hour, width="stretch")
-
-# 4. Duration vs Hour Analysis (Physiological Response)
-if "duration_sec" in df.columns and "hour" in df.columns:
-    fig_duration_hour = px.scatter(
-        df,
-        x="hour", y="duration_sec",
-        title="Fatigue Event Duration vs Hour of Day (Physiological Response)",
-        hover_data=[col_operator, col_asset]
-    )
-    st.plotly_chart(fig_duration_hour, width="stretch")
-
-# 5. Operator vs Shift Analysis (Shift Pattern Risk)
-if col_operator and col_shift:
-    op_shift_counts = df.groupby([col_operator, col_shift]).size().reset_index(name="alerts")
-    fig_op_shift = px.bar(
-        op_shift_counts,
-        x=col_operator, y="alerts", color=col_shift,
-        title="Operator Fatigue Distribution by Shift (Shift Pattern Risk)"
-    )
-    st.plotly_chart(fig_op_shift, width="stretch")
-
-# 6. Weekly Trend Analysis (Recovery Pattern) - With Color by Shift
-if 'week' in df.columns and col_shift:
-    # Create a new column for the legend
-    df['shift_legend'] = df[col_shift].apply(lambda x: f"Shift {x}")
-    
-    # Group by week and shift
-    weekly_shift_trend = df.groupby(['week', 'shift_legend']).size().reset_index(name='alerts')
-    
-    fig_weekly = px.line(
-        weekly_shift_trend,
-        x='week', y='alerts',
-        color='shift_legend',
-        title="Weekly Fatigue Trend by Shift (Recovery Pattern)",
-        markers=True
-    )
-    # Customize colors for each shift
-    if len(weekly_shift_trend['shift_legend'].unique()) >= 2:
-        # Assign specific colors to shifts (e.g., Shift 1: blue, Shift 2: red)
-        color_map = {}
-        unique_shifts = sorted(weekly_shift_trend['shift_legend'].unique())
-        for i, shift in enumerate(unique_shifts):
-            if i == 0:
-                color_map[shift] = 'blue'
-            elif i == 1:
-                color_map[shift] = 'red'
-            else:
-                color_map[shift] = f'hsl({i*60}, 70%, 50%)'  # Generate different colors for more than 2 shifts
-        
-        fig_weekly.update_traces(marker=dict(size=8))
-        fig_weekly.update_layout(
-            legend_title_text="Shift",
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-        # Apply custom colors
-        for trace in fig_weekly.data:
-            if trace.name in color_map:
-                trace.line.color = color_map[trace.name]
-                trace.marker.color = color_map[trace.name]
-    
-    st.plotly_chart(fig_weekly, width="stretch")
-
-# 7. Speed Distribution Analysis (Task Complexity)
-if col_speed:
-    speed_df_clean = df.dropna(subset=[col_speed])
-    if not speed_df_clean.empty:
-        fig_speed_dist = px.histogram(
-            speed_df_clean,
-            x=col_speed,
-            title="Speed Distribution (Task Complexity Indicator)",
-            nbins=20
-        )
-        st.plotly_chart(fig_speed_dist, width="stretch")
+    # Bursts of alerts from one operator on one asset can be counted as a single fatigue episode
+    count_episodes = st.radio("Count by", ["Alerts", "Episodes"], horizontal=True) == "Episodes"
+    episode_gap = EPISODE_GAP_SEC
+    if count_episodes:
+        episode_gap = float(st.number_input(
+            "Episode gap (seconds)", min_value=0, max_value=3600, value=int(EPISODE_GAP_SEC), step=30,
+            help="Alerts of the same operator and asset closer than this are merged into one episode"
+        ))
+    show_timing = st.checkbox("Show performance panel", value=False)
+
+
+@st.cache_resource(max_entries=4)
+def get_episodes(version, gap_sec, _dataset):
+    # Episodes at a non-default gap, built once per (data version, gap) and shared like the dataset
+    return episode_set(_dataset.df, _dataset.column_map, gap_sec)
+
+
+timing.begin("cube", rows_in=len(df))
+
+# Same selections applied to the shared aggregate cube; charts and insights roll it up
+if count_episodes:
+    episodes = dataset.episodes
+    if episode_gap != episodes.gap_sec:
+        episodes = get_episodes(data_version, episode_gap, dataset)
+    # Episode rows keep the alert columns, so the same selections replay onto the episode index and cube
+    df = flt.replay(episodes.index).apply()
+    cube = episodes.cube.view(flt)
+else:
+    cube = dataset.cube.view(flt)
+count_unit = "episodes" if count_episodes else "alerts"
 
+@st.cache_resource
+def get_figure_cache():
+    # Built figures shared by every session, LRU-evicted under a memory cap
+    return FigureCache()
 
-# =================== INSIGHTS BY ADVANCED ANALYTICS =====================
-st.subheader("Insights by Advanced Analytics")
+# Figures are rebuilt only when the dataset or the selected rows change
+figures = get_figure_cache()
+chart_key = (data_version, flt.state_key(), count_unit, episode_gap)
 
-# 1. Critical Hour Analysis (2-5 AM)
-critical_hours = [2, 3, 4, 5]
-critical_alerts = df[df['hour'].isin(critical_hours)]
-critical_pct = (len(critical_alerts) / len(df)) * 100 if len(df) > 0 else 0
+timing.end(rows_out=len(df))
 
-st.markdown(f"Critical Hour Risk (2-5 AM)")
-# Use conditional formatting for background color
-bg_color = "#ffcccc" if critical_pct > 50 else "#ffebcc" if critical_pct > 25 else "#ffffcc" if critical_pct > 10 else "#e6ffe6"
-st.markdown(f'<div style="background-color: {bg_color}; padding: 10px; border-radius: 5px;">Critical Hour Alerts: {len(critical_alerts)} ({critical_pct:.1f}% of total alerts)</div>', unsafe_allow_html=True)
-if critical_pct > 10:  # If more than 10% of alerts happen in critical hours
-    st.warning(f"High risk: {critical_pct:.1f}% of fatigue alerts occur during critical hours (2-5 AM). This is a known circadian dip period.")
-else:
-    st.info(f"{critical_pct:.1f}% of alerts occur during critical hours. This is within acceptable range.")
 
-# 2. High-Speed Fatigue Analysis (Environmental Risk)
-if col_speed:
-    high_speed_threshold = df[col_speed].quantile(0.75)  # Top 25% of speeds
-    high_speed_fatigue = df[df[col_speed] >= high_speed_threshold]
-    high_speed_pct = (len(high_speed_fatigue) / len(df)) * 100 if len(df) > 0 else 0
-    
-    st.markdown(f"High-Speed Fatigue Risk (Speed > {high_speed_threshold:.0f} km/h)")
-    st.metric("High-Speed Fatigue Events", f"{len(high_speed_fatigue)}", f"{high_speed_pct:.1f}% of total alerts")
-    if high_speed_pct > 20:  # If more than 20% of alerts happen at high speed
-        st.warning(f"High risk: {high_speed_pct:.1f}% of fatigue alerts occur at high speeds. This increases accident severity potential.")
-    else:
-        st.info(f"{high_speed_pct:.1f}% of alerts occur at high speeds. This is within acceptable range.")
+# =================== KPI METRICS =====================
+timing.begin("kpi", rows_in=len(df))
+st.subheader("Executive Safety Dashboard")
 
-# 3. Shift Pattern Analysis
-if col_shift:
-    shift_counts = df[col_shift].value_counts()
-    shift_alerts_by_hour = df.groupby([col_shift, 'hour']).size().reset_index(name='alerts')
-    
-    st.markdown(f"Shift Pattern Risk")
-    for shift_val in shift_counts.index:
-        shift_pct = (shift_counts[shift_val] / len(df)) * 100
-        st.metric(f"Shift {shift_val} Alerts", f"{shift_counts[shift_val]}", f"{shift_pct:.1f}% of total alerts")
-        if shift_pct > 50:  # If one shift has more than 50% of alerts
-            st.warning(f"Shift {shift_val} has disproportionately high alerts ({shift_pct:.1f}%). Review shift scheduling and workload.")
-        else:
-            st.info(f"Shift {shift_val} alert distribution is acceptable ({shift_pct:.1f}%).")
+col1, col2, col3, col4 = st.columns(4)
 
-# 4. Operator Risk Profiling
-if col_operator:
-    operator_alerts = df[col_operator].value_counts()
-    top_risk_operators = operator_alerts.head(5)  # Top 5 operators by alerts
-    
-    st.markdown(f"High-Risk Operator Identification")
-    for op_name, count in top_risk_operators.items():
-        op_pct = (count / len(df)) * 100
-        st.metric(f"Operator: {op_name}", f"{count} alerts", f"{op_pct:.1f}% of total alerts")
-        if op_pct > 5:  # If an operator has more than 5% of all alerts
-            st.warning(f"Operator {op_name} has high fatigue risk ({op_pct:.1f}% of alerts). Consider coaching or rest plan.")
-        else:
-            st.info(f"Operator {op_name} fatigue risk is within acceptable range ({op_pct:.1f}%).")
+kpi = kpis(cube, column_map)
+col1.metric("Total Episodes" if count_episodes else "Total Alerts", f"{kpi['total_alerts']:,}")
+# Large selections count distinct operators/equipment from merged sketches (about 1.6% error): marked with ≈
+approx = lambda n: f"≈{n:,}" if kpi['approximate'] else n
+col2.metric("Operators", approx(kpi['operators']) if col_operator else "-")
+col3.metric("Qty Equipment", approx(kpi['equipment']) if col_asset else "-")  # Changed from "Assets" to "Qty Equipment"
+col4.metric("Avg Duration (sec)", round(kpi['avg_duration_sec'],2) if "duration_sec" in df.columns else "N/A")
+timing.end(rows_out=kpi['total_alerts'])
 
 
 # =================== FATIGUE RISK MATRIX =====================
@@ -695,56 +499,481 @@ with st.sidebar:
     st.markdown(html_string, unsafe_allow_html=True)
 
 
-# =================== AI INSIGHT ENGINE =====================
-st.subheader("Automated Insight Summary")
+# =================== ANALYTICS SECTIONS (lazy tabs) =====================
+def is_open(section):
+    # Tabs that track their state report .open; only the selected one runs its rollups and builds its charts.
+    # Older Streamlit has no state tracking (.open is missing/None) and runs every tab.
+    return getattr(section, "open", None) is not False
 
-# Create a more elegant summary
-insights = []
+try:
+    tab_risk, tab_trends, tab_advanced, tab_insights = st.tabs(
+        ["Risk Categorization", "Trends", "Advanced Analytics", "Insights"], key="analytics_section", on_change="rerun"
+    )
+except TypeError:
+    tab_risk, tab_trends, tab_advanced, tab_insights = st.tabs(["Risk Categorization", "Trends", "Advanced Analytics", "Insights"])
+
+with tab_risk:
+    if is_open(tab_risk):
+        # =================== FATIGUE RISK CATEGORIZATION =====================
+        timing.begin("risk", rows_in=len(df))
+        st.subheader("Fatigue Risk Categorization")
+
+        # Define risk categories based on the provided matrix
+        if col_speed and "hour" in df.columns:
+            def build_risk_figure():
+                # Count alerts by risk category
+                risk_counts = rollup("risk", cube, column_map)
+
+                # Create a bar chart showing the distribution of risk categories
+                fig_risk = px.bar(
+                    x=risk_counts.index,
+                    y=risk_counts.values,
+                    title="Fatigue Risk Categories Distribution",
+                    labels={'x': 'Risk Category', 'y': 'Number of Alerts'},
+                    color=risk_counts.index,
+                    color_discrete_map=RISK_COLORS
+                )
+                fig_risk.update_layout(
+                    xaxis_title="Risk Category",
+                    yaxis_title="Number of Alerts",
+                    height=400
+                )
+                # Add legend to explain each category
+                fig_risk.update_layout(
+                    legend_title_text="Risk Level",
+                    legend=dict(
+                        orientation="v",
+                        yanchor="top",
+                        y=1,
+                        xanchor="left",
+                        x=1.02
+                    )
+                )
+                # Add annotations to explain what each risk level means
+                for i, (cat, count) in enumerate(risk_counts.items()):
+                    if cat == 'Critical':
+                        fig_risk.add_annotation(
+                            x=cat,
+                            y=count + 1,
+                            text="High fatigue + high-speed haul road",
+                            showarrow=False,
+                            font=dict(size=10),
+                            bgcolor="red",
+                            opacity=0.8
+                        )
+                    elif cat == 'High':
+                        fig_risk.add_annotation(
+                            x=cat,
+                            y=count + 1,
+                            text="Moderate fatigue + decline haul road",
+                            showarrow=False,
+                            font=dict(size=10),
+                            bgcolor="orange",
+                            opacity=0.8
+                        )
+                    elif cat == 'Medium':
+                        fig_risk.add_annotation(
+                            x=cat,
+                            y=count + 1,
+                            text="High fatigue + low-risk task",
+                            showarrow=False,
+                            font=dict(size=10),
+                            bgcolor="yellow",
+                            opacity=0.8
+                        )
+                    elif cat == 'Low':
+                        fig_risk.add_annotation(
+                            x=cat,
+                            y=count + 1,
+                            text="Low fatigue + non-hazard task",
+                            showarrow=False,
+                            font=dict(size=10),
+                            bgcolor="green",
+                            opacity=0.8
+                        )
+                return fig_risk
+
+            st.plotly_chart(figures.get("risk", chart_key, build_risk_figure), width="stretch")
+
+        timing.end(rows_out=kpi['total_alerts'])
+
+
+with tab_trends:
+    if is_open(tab_trends):
+        # =================== TREND ANALYTICS =====================
+        timing.begin("trends", rows_in=len(df))
+        st.subheader("Fatigue Trend Analysis")
+
+        # Hourly
+        fig_hour = figures.get("hour", chart_key, lambda: px.bar(
+            rollup("hour", cube, column_map),
+            x="hour", y="alerts",
+            title="Fatigue Alerts by Hour"
+        ))
+        st.plotly_chart(fig_hour, width="stretch")
+
+        # Shift-Based
+        if col_shift:
+            def build_shift_figure():
+                fig_shift = px.bar(
+                    rollup("shift", cube, column_map),
+                    x=col_shift, y="alerts",
+                    title="Fatigue Distribution by Shift"
+                )
+                # Force the x-axis (shift) to be categorical to avoid decimal labels
+                fig_shift.update_xaxes(type='category')
+                return fig_shift
+
+            st.plotly_chart(figures.get("shift", chart_key, build_shift_figure), width="stretch")
+
+            def build_heat_figure():
+                # hour inside shift heatmap
+                heat_df = rollup("shift_hour", cube, column_map)
+
+                fig_heat = px.density_heatmap(
+                    heat_df,
+                    x="hour", y=col_shift, z="alerts",
+                    title="Heatmap Fatigue by Shift & Hour",
+                    color_continuous_scale="reds"
+                )
+                # Force the y-axis (shift) to be categorical to avoid decimal labels
+                fig_heat.update_yaxes(type='category')
+                return fig_heat
+
+            st.plotly_chart(figures.get("shift_hour_heatmap", chart_key, build_heat_figure), width="stretch")
+
+
+        # Operator Ranking
+        if col_operator:
+            def build_operator_figure():
+                operator_counts = rollup("operator", cube, column_map)
+                return px.bar(
+                    operator_counts,
+                    x="operator", y="alerts",
+                    title="Top Fatigue Alerts by Operator"
+                )
+
+            st.plotly_chart(figures.get("operator", chart_key, build_operator_figure), width="stretch")
+
+        timing.end(rows_out=kpi['total_alerts'])
+
+
+with tab_advanced:
+    if is_open(tab_advanced):
+        # =================== NEW CHARTS (Based on Mining Fatigue Factors) =====================
+        timing.begin("advanced_analytics", rows_in=len(df))
+        st.subheader("Advanced Mining Fatigue Analytics")
+
+        # 1. Day of Week Analysis (Workload Pattern)
+        if 'day_of_week' in df.columns:
+            def build_day_figure():
+                day_counts = rollup("day_of_week", cube, column_map)
+                return px.bar(
+                    day_counts,
+                    x=day_counts.index, y=day_counts.values,
+                    title="Fatigue Alerts by Day of Week (Workload Pattern)"
+                )
+
+            st.plotly_chart(figures.get("day_of_week", chart_key, build_day_figure), width="stretch")
+
+        # 2. Fleet Type Analysis (Task & Workload)
+        if col_fleet_type:
+            def build_fleet_figure():
+                fleet_counts = rollup("fleet_type", cube, column_map)
+                return px.bar(
+                    fleet_counts,
+                    x=col_fleet_type, y="alerts",
+                    title="Fatigue Alerts by Fleet Type (Task Complexity)"
+                )
+
+            st.plotly_chart(figures.get("fleet_type", chart_key, build_fleet_figure), width="stretch")
+
+        # Scatter charts also depend on the Chart Settings
+        scatter_key = chart_key + (max_scatter_points, scatter_mode)
+
+        # 3. Speed vs Hour Analysis (Environmental Factors & Workload)
+        if col_speed and "hour" in df.columns:
+            def build_speed_hour_figure():
+                # Remove rows with NaN speed values for this analysis
+                speed_df = df.dropna(subset=[col_speed])
+                if speed_df.empty:
+                    return None
+                title = "Speed vs Hour of Day (Fatigue Events) - Environmental Factor"
+                if len(speed_df) > max_scatter_points and scatter_mode == MODE_DENSITY:
+                    return px.density_heatmap(
+                        binned_density(speed_df, "hour", col_speed),
+                        x="hour", y=col_speed, z="alerts", nbinsx=24,
+                        title=f"{title} (density of {len(speed_df):,} events)",
+                        color_continuous_scale="reds"
+                    )
+                shown = stratified_sample(speed_df, "hour", col_speed, max_scatter_points)
+                return px.scatter(
+                    shown,
+                    x="hour", y=col_speed,
+                    title=title if len(shown) == len(speed_df) else f"{title} ({len(shown):,} of {len(speed_df):,} events, outliers kept)",
+                    hover_data=[col_operator, col_asset]
+                )
+
+            fig_speed_hour = figures.get("speed_hour", scatter_key, build_speed_hour_figure)
+            if fig_speed_hour is not None:
+                st.plotly_chart(fig_speed_hour, width="stretch")
+
+        # 4. Duration vs Hour Analysis (Physiological Response)
+        if "duration_sec" in df.columns and "hour" in df.columns:
+            def build_duration_hour_figure():
+                title = "Fatigue Event Duration vs Hour of Day (Physiological Response)"
+                if len(df) > max_scatter_points and scatter_mode == MODE_DENSITY:
+                    return px.density_heatmap(
+                        binned_density(df, "hour", "duration_sec"),
+                        x="hour", y="duration_sec", z="alerts", nbinsx=24,
+                        title=f"{title} (density of {len(df):,} events)",
+                        color_continuous_scale="reds"
+                    )
+                shown = stratified_sample(df, "hour", "duration_sec", max_scatter_points)
+                return px.scatter(
+                    shown,
+                    x="hour", y="duration_sec",
+                    title=title if len(shown) == len(df) else f"{title} ({len(shown):,} of {len(df):,} events, outliers kept)",
+                    hover_data=[col_operator, col_asset]
+                )
+
+            st.plotly_chart(figures.get("duration_hour", scatter_key, build_duration_hour_figure), width="stretch")
+
+        # 5. Operator vs Shift Analysis (Shift Pattern Risk)
+        if col_operator and col_shift:
+            def build_op_shift_figure():
+                op_shift_counts = rollup("operator_shift", cube, column_map)
+                return px.bar(
+                    op_shift_counts,
+                    x=col_operator, y="alerts", color=col_shift,
+                    title="Operator Fatigue Distribution by Shift (Shift Pattern Risk)"
+                )
+
+            st.plotly_chart(figures.get("operator_shift", chart_key, build_op_shift_figure), width="stretch")
+
+        # 6. Weekly Trend Analysis (Recovery Pattern) - With Color by Shift
+        if 'week' in df.columns and col_shift:
+            def build_weekly_figure():
+                # Alerts by week and shift, with a "Shift N" legend column
+                weekly_shift_trend = rollup("weekly_shift", cube, column_map)
+
+                fig_weekly = px.line(
+                    weekly_shift_trend,
+                    x='week', y='alerts',
+                    color='shift_legend',
+                    title="Weekly Fatigue Trend by Shift (Recovery Pattern)",
+                    markers=True
+                )
+                # Customize colors for each shift
+                if len(weekly_shift_trend['shift_legend'].unique()) >= 2:
+                    # Assign specific colors to shifts (e.g., Shift 1: blue, Shift 2: red)
+                    color_map = {}
+                    unique_shifts = sorted(weekly_shift_trend['shift_legend'].unique())
+                    for i, shift in enumerate(unique_shifts):
+                        if i == 0:
+                            color_map[shift] = 'blue'
+                        elif i == 1:
+                            color_map[shift] = 'red'
+                        else:
+                            color_map[shift] = f'hsl({i*60}, 70%, 50%)'  # Generate different colors for more than 2 shifts
+
+                    fig_weekly.update_traces(marker=dict(size=8))
+                    fig_weekly.update_layout(
+                        legend_title_text="Shift",
+                        legend=dict(
+                            orientation="h",
+                            yanchor="bottom",
+                            y=1.02,
+                            xanchor="right",
+                            x=1
+                        )
+                    )
+                    # Apply custom colors
+                    for trace in fig_weekly.data:
+                        if trace.name in color_map:
+                            trace.line.color = color_map[trace.name]
+                            trace.marker.color = color_map[trace.name]
+                return fig_weekly
+
+            st.plotly_chart(figures.get("weekly_shift", chart_key, build_weekly_figure), width="stretch")
+
+        # 7. Speed Distribution Analysis (Task Complexity)
+        if col_speed:
+            def build_speed_dist_figure():
+                speed_counts = rollup("speed_distribution", cube, column_map)
+                if speed_counts.empty:
+                    return None
+                return px.histogram(
+                    speed_counts,
+                    x=SPEED_BUCKET, y="alerts", histfunc="sum",
+                    title="Speed Distribution (Task Complexity Indicator)",
+                    labels={SPEED_BUCKET: col_speed, "alerts": "count"},
+                    nbins=20
+                )
+
+            fig_speed_dist = figures.get("speed_distribution", chart_key, build_speed_dist_figure)
+            if fig_speed_dist is not None:
+                st.plotly_chart(fig_speed_dist, width="stretch")
+
+        timing.end(rows_out=kpi['total_alerts'])
+
+
+with tab_insights:
+    if is_open(tab_insights):
+        # =================== INSIGHTS BY ADVANCED ANALYTICS =====================
+        timing.begin("insights", rows_in=len(df))
+        st.subheader("Insights by Advanced Analytics")
+
+        # Every statistic of both insight sections, computed once per selection (and cached like the figures)
+        ins = figures.get("insights", chart_key, lambda: compute_insights(cube, column_map))
+
+        # 1. Critical Hour Analysis (2-5 AM)
+        critical_alerts = ins.critical_alerts
+        critical_pct = ins.critical_pct
+
+        st.markdown(f"Critical Hour Risk (2-5 AM)")
+        # Use conditional formatting for background color
+        bg_color = "#ffcccc" if critical_pct > 50 else "#ffebcc" if critical_pct > 25 else "#ffffcc" if critical_pct > 10 else "#e6ffe6"
+        st.markdown(f'<div style="background-color: {bg_color}; padding: 10px; border-radius: 5px;">Critical Hour Alerts: {critical_alerts} ({critical_pct:.1f}% of total alerts)</div>', unsafe_allow_html=True)
+        if critical_pct > 10:  # If more than 10% of alerts happen in critical hours
+            st.warning(f"High risk: {critical_pct:.1f}% of fatigue alerts occur during critical hours (2-5 AM). This is a known circadian dip period.")
+        else:
+            st.info(f"{critical_pct:.1f}% of alerts occur during critical hours. This is within acceptable range.")
+
+        # 2. High-Speed Fatigue Analysis (Environmental Risk)
+        if col_speed:
+            high_speed_threshold = ins.high_speed_threshold  # Top 25% of speeds
+            high_speed_fatigue = ins.high_speed_alerts
+            high_speed_pct = ins.high_speed_pct
+
+            st.markdown(f"High-Speed Fatigue Risk (Speed > {high_speed_threshold:.0f} km/h)")
+            st.metric("High-Speed Fatigue Events", f"{high_speed_fatigue}", f"{high_speed_pct:.1f}% of total alerts")
+            if high_speed_pct > 20:  # If more than 20% of alerts happen at high speed
+                st.warning(f"High risk: {high_speed_pct:.1f}% of fatigue alerts occur at high speeds. This increases accident severity potential.")
+            else:
+                st.info(f"{high_speed_pct:.1f}% of alerts occur at high speeds. This is within acceptable range.")
 
-# Peak hour
-if "hour" in df.columns and not df.empty:
-    peak_hour = df["hour"].value_counts().idxmax()
-    critical_hours = [2, 3, 4, 5]
-    if peak_hour in critical_hours:
-        insights.append(f"⚠️ Most fatigue risk occurs at **{peak_hour}:00** — during critical circadian low period (2-5 AM). Consider enhanced monitoring.")
-    else:
-        insights.append(f"Most fatigue risk occurs at **{peak_hour}:00** — likely due to circadian drop.")
-
-# Risk shift
-if col_shift and not df.empty:
-    worst_shift = df[col_shift].value_counts().idxmax()
-    insights.append(f"👷 Highest fatigue recorded in **Shift {worst_shift}** — review scheduling & workload.")
-
-# Worst operator
-if col_operator and not df.empty:
-    worst_operator = df[col_operator].value_counts().idxmax()
-    insights.append(f"⚠️ Operator at highest risk: **{worst_operator}** — suggested coaching or rest plan.")
-
-# Duration risk
-if "duration_sec" in df.columns and not df.empty:
-    avg_duration = df["duration_sec"].mean()
-    if not pd.isna(avg_duration) and avg_duration > 10:
-        insights.append("⏳ Long fatigue event duration suggests slow response — improve alerting training.")
-
-# Critical hour insight
-if "hour" in df.columns and not df.empty:
-    critical_alerts = df[df['hour'].isin([2, 3, 4, 5])]
-    if len(critical_alerts) > 0:
-        critical_pct = (len(critical_alerts) / len(df)) * 100
-        if critical_pct > 15:
-            insights.append(f"🌙 **CRITICAL HOUR RISK**: {critical_pct:.1f}% of alerts occur during circadian low (2-5 AM). Consider enhanced monitoring during this period.")
-
-# High-speed insight
-if col_speed and not df.empty:
-    high_speed_fatigue = df[df[col_speed] >= df[col_speed].quantile(0.75)] if not df[col_speed].dropna().empty else pd.DataFrame()
-    if len(high_speed_fatigue) > 0:
-        high_speed_pct = (len(high_speed_fatigue) / len(df)) * 100
-        if high_speed_pct > 20:
-            insights.append(f"🚀 **HIGH-SPEED RISK**: {high_speed_pct:.1f}% of fatigue events occur at high speeds, increasing accident severity potential.")
-
-# Output insights in an elegant format
-for i in insights:
-    st.markdown(f"- {i}")
+        # 3. Shift Pattern Analysis
+        if col_shift:
+            shift_counts = ins.shift_counts
+
+            st.markdown(f"Shift Pattern Risk")
+            for shift_val in shift_counts.index:
+                shift_pct = ins.pct(shift_counts[shift_val])
+                st.metric(f"Shift {shift_val} Alerts", f"{shift_counts[shift_val]}", f"{shift_pct:.1f}% of total alerts")
+                if shift_pct > 50:  # If one shift has more than 50% of alerts
+                    st.warning(f"Shift {shift_val} has disproportionately high alerts ({shift_pct:.1f}%). Review shift scheduling and workload.")
+                else:
+                    st.info(f"Shift {shift_val} alert distribution is acceptable ({shift_pct:.1f}%).")
+
+        # 4. Operator Risk Profiling
+        if col_operator:
+            top_risk_operators = ins.operator_counts.head(5)  # Top 5 operators by alerts
+
+            st.markdown(f"High-Risk Operator Identification")
+            for op_name, count in top_risk_operators.items():
+                op_pct = ins.pct(count)
+                st.metric(f"Operator: {op_name}", f"{count} alerts", f"{op_pct:.1f}% of total alerts")
+                if op_pct > 5:  # If an operator has more than 5% of all alerts
+                    st.warning(f"Operator {op_name} has high fatigue risk ({op_pct:.1f}% of alerts). Consider coaching or rest plan.")
+                else:
+                    st.info(f"Operator {op_name} fatigue risk is within acceptable range ({op_pct:.1f}%).")
+
+        # 5. Rolling Operator Risk Index (saved next to the store and extended by each appended batch)
+        if col_operator:
+            st.markdown("Rolling Operator Risk Index")
+            window_days = st.radio("Window", RISK_WINDOWS, format_func=lambda d: f"{d} days", horizontal=True, key="risk_window")
+            # Window ends on the last day of the current selection
+            as_of = df["date"].max() if not df.empty else None
+            # A cleared operator filter (every index operator) and "all options selected" share a chart_key
+            operators_key = tuple(selected_operators) if selected_operators else None
+            ranking = figures.get("risk_index", chart_key + (window_days, operators_key),
+                                  lambda: dataset.risk_index.window(window_days, as_of, selected_operators))
+            st.caption("Risk index = alerts + extra weight for 2-5 AM alerts, top-quartile speed and event duration")
+            st.dataframe(ranking.head(10).round({"risk_index": 1}), width="stretch", hide_index=True)
+
+        # =================== AI INSIGHT ENGINE =====================
+        st.subheader("Automated Insight Summary")
+
+        # Same Insights result as above; summary_lines only picks the bullets
+        insights = summary_lines(ins)
+
+        # Output insights in an elegant format
+        for i in insights:
+            st.markdown(f"- {i}")
+
+        timing.end(rows_out=kpi['total_alerts'])
+
+
+# =================== EXPORT FILTERED ALERTS =====================
+# Prepared exports older than this are removed (their sessions have most likely ended)
+EXPORT_MAX_AGE_SEC = 3600
+
+
+@st.cache_resource
+def get_export_dir():
+    # One app-owned directory for prepared exports, emptied when the server process starts
+    path = os.path.join(tempfile.gettempdir(), "fatigue-exports")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def prune_exports(directory, max_age=EXPORT_MAX_AGE_SEC):
+    # Sessions never say goodbye, so exports nobody downloaded are dropped by age
+    cutoff = time.time() - max_age
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+timing.begin("export", rows_in=len(df))
+st.subheader("Export Filtered Alerts")
+
+export_col1, export_col2 = st.columns([1, 3])
+export_format = export_col1.selectbox("Format", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][1])
+exported_rows = 0
+if export_col2.button(f"Prepare export ({len(df):,} {count_unit})"):
+    # Written chunk by chunk to a temp file, so the export is never one big in-memory string
+    previous = st.session_state.pop("export_path", None)
+    if previous and os.path.exists(previous):
+        os.remove(previous)
+    export_df = df
+    if col_speed and "hour" in df.columns:
+        # Risk tier of each alert (quartiles of the selection, as in the chart), added to the export only
+        export_df = df.assign(risk_category=categorize_risk(df[col_speed], df['hour'], cube.speed_quartiles()))
+    export_dir = get_export_dir()
+    prune_exports(export_dir)
+    with tempfile.NamedTemporaryFile(suffix=EXPORT_FORMATS[export_format][1], dir=export_dir, delete=False) as tmp:
+        write_export(export_df, tmp, export_format)
+    exported_rows = len(export_df)
+    st.session_state["export_path"] = tmp.name
+    st.session_state["export_format"] = export_format
+
+export_path = st.session_state.get("export_path")
+if export_path and os.path.exists(export_path):
+    fmt = st.session_state["export_format"]
+    with open(export_path, "rb") as f:
+        st.download_button(
+            f"Download {os.path.getsize(export_path) / 1024 ** 2:.1f} MB",
+            f, file_name=f"fatigue_alerts{EXPORT_FORMATS[fmt][1]}", mime=EXPORT_FORMATS[fmt][0]
+        )
+
+timing.end(rows_out=exported_rows)
+
+
+# =================== PERFORMANCE PANEL (optional) =====================
+if show_timing:
+    st.subheader("Performance (this rerun)")
+    st.dataframe(timing.to_frame().round({"seconds": 4, "mem_delta_mb": 2, "share_pct": 1}), width="stretch")
+    st.caption(f"Total {timing.total_seconds:.3f}s · figure cache {figures.hits} hits / {figures.misses} misses, "
+               f"{len(figures)} figures ({figures.nbytes / 1024 ** 2:.1f} MB)")
+    st.download_button("Download timing log (JSON lines)", timing.to_json_lines(),
+                       file_name=f"timing-{timing.run_id}.jsonl", mime="application/json")
 
 
 # ================= FOOTER ===========================
@@ -0,0 +1,73 @@
+"""Benchmark: row-wise df.apply risk categorization vs the vectorized engine.
+
+The legacy lambda recomputes the speed quantiles for every row, so running it
+over 1M rows would take hours. It is timed on a row sample (still evaluated
+against the full frame's quantiles, exactly as in the dashboard) and the
+per-row cost is extrapolated to the full size.
+
+Usage:
+    python -m benchmarks.bench_risk [--sizes 10000 100000 1000000] [--legacy-sample 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.risk import categorize_risk  # noqa: E402
+
+COL_SPEED = "(in_km/hour)"
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    speed = rng.integers(0, 60, n).astype("float64")
+    speed[rng.random(n) < 0.02] = np.nan
+    return pd.DataFrame({COL_SPEED: speed, "hour": rng.integers(0, 24, n)})
+
+
+def legacy_categorize(df, rows):
+    # Verbatim copy of the original app.py lambda
+    return rows.apply(lambda row:
+        'Critical' if (row[COL_SPEED] > df[COL_SPEED].quantile(0.75) and row['hour'] in [2, 3, 4, 5]) else
+        'High' if (row[COL_SPEED] > df[COL_SPEED].quantile(0.5) and row['hour'] in [2, 3, 4, 5]) else
+        'Medium' if (row[COL_SPEED] > df[COL_SPEED].quantile(0.25) and row['hour'] in [2, 3, 4, 5]) else
+        'Low' if (row[COL_SPEED] <= df[COL_SPEED].quantile(0.25) and row['hour'] not in [2, 3, 4, 5]) else
+        'Medium', axis=1)
+
+
+def run(sizes, legacy_sample):
+    print(f"{'rows':>10} {'legacy (s)':>14} {'vectorized (s)':>15} {'speedup':>10}  labels")
+    for n in sizes:
+        df = make_frame(n)
+
+        t0 = time.perf_counter()
+        fast = categorize_risk(df[COL_SPEED], df["hour"])
+        t_fast = time.perf_counter() - t0
+
+        sample = df.iloc[:min(legacy_sample, n)]
+        t0 = time.perf_counter()
+        slow = legacy_categorize(df, sample)
+        t_sample = time.perf_counter() - t0
+        t_legacy = t_sample / len(sample) * n
+        estimated = "~" if len(sample) < n else " "
+
+        same = "identical" if (slow == fast.loc[sample.index]).all() else "MISMATCH"
+        print(f"{n:>10,} {estimated}{t_legacy:>13.2f} {t_fast:>15.4f} {t_legacy / t_fast:>9,.0f}x  {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-sample", type=int, default=500,
+                        help="rows evaluated with the legacy lambda before extrapolating (default: 500)")
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_sample)
+
+
+if __name__ == "__main__":
+    main()
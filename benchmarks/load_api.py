@@ -0,0 +1,142 @@
+"""Load test for the local JSON API (analytics.api).
+
+Client threads request a mix of endpoints and filters for a fixed duration
+and report throughput, latency percentiles, errors and the API's cache hit
+rate. ``--distinct`` sets how many different filters the clients draw from,
+so cache-friendly (few filters) and cache-hostile (many) traffic can be
+compared. Without ``--url`` the API is started in this process on a free
+port, over the same dataset the dashboard loads.
+
+Usage:
+    python -m benchmarks.load_api [--url http://127.0.0.1:8502] [--clients 16] [--seconds 10] [--distinct 50]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.api import AGGREGATES  # noqa: E402
+
+ENDPOINTS = ["/kpis", "/summary"] + [f"/aggregates/{name}" for name in AGGREGATES]
+
+
+def random_filters(rng, options):
+    """One query string drawn from the dataset's own filter values."""
+    query = {}
+    for name, values in options.items():
+        if name != "date" and values and rng.random() < 0.4:
+            query[name] = ",".join(str(v) for v in rng.sample(values, min(len(values), rng.randint(1, 3))))
+    if options["date"] and rng.random() < 0.5:
+        days = sorted(rng.sample(options["date"], 2)) if len(options["date"]) > 1 else options["date"] * 2
+        query["date_from"], query["date_to"] = days
+    if rng.random() < 0.3:
+        low = rng.randint(0, 23)
+        query["hour_from"], query["hour_to"] = low, rng.randint(low, 23)
+    if rng.random() < 0.2:
+        query["count"] = "episodes"
+    return urlencode(query)
+
+
+def filter_options(dataset):
+    cm = dataset.column_map
+    cells = dataset.cube.cells
+    columns = {"year": "year", "month": "month", "operator": cm.operator, "shift": cm.shift, "fleet_type": cm.fleet_type}
+    options = {name: sorted(str(v) for v in cells[col].dropna().unique()) if col else []
+               for name, col in columns.items()}
+    options["date"] = sorted(f"{d:%Y-%m-%d}" for d in cells["date"].dropna().unique())
+    return options
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def run(base_url, urls, clients, seconds):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(seed):
+        rng = random.Random(seed)
+        mine, failed = [], 0
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            status = get(base_url + rng.choice(urls))
+            mine.append(time.perf_counter() - t0)
+            failed += status != 200
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    ms = np.array(latencies) * 1000
+    print(f"{len(ms):,} requests in {elapsed:.1f}s from {clients} clients: {len(ms) / elapsed:,.0f} req/s, "
+          f"{sum(errors)} errors")
+    print(f"latency ms  p50 {np.percentile(ms, 50):.1f}  p95 {np.percentile(ms, 95):.1f}  "
+          f"p99 {np.percentile(ms, 99):.1f}  max {ms.max():.1f}")
+    with urllib.request.urlopen(base_url + "/health", timeout=30) as response:
+        cache = json.load(response)["cache"]
+    total = cache["hits"] + cache["misses"]
+    print(f"api cache  {cache['entries']} entries, hit rate {cache['hits'] / total * 100 if total else 0:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="running API to test (default: start one in this process)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--distinct", type=int, default=50, help="different filters the clients draw from")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from analytics.refresh import DatasetWatcher
+
+    # Filters come from the dataset itself, so most requests select real rows
+    watcher = DatasetWatcher().start()
+    rng = random.Random(args.seed)
+    options = filter_options(watcher.current())
+    urls = [f"{rng.choice(ENDPOINTS)}?{random_filters(rng, options)}" for _ in range(args.distinct)]
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        from analytics.api import AggregateAPI, make_server
+
+        server = make_server(AggregateAPI(watcher), "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        run(base_url.rstrip("/"), urls, args.clients, args.seconds)
+    finally:
+        watcher.stop()
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Headless benchmark suite for the dashboard pipeline.
+
+Times every stage the dashboard runs on a rerun (normalize, cache round trip,
+filter index and filtering, risk categorization, cube build, each chart rollup,
+KPIs, insight metrics and the episode build), plus the partitioned store's
+write and latest-month read, on synthetic alert sets, and
+writes the results as JSON so runs can be compared between versions.
+
+Usage:
+    python -m benchmarks.run [--sizes 10000 100000 1000000 5000000] [--repeat 3]
+                             [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.cache import read_frame, write_frame  # noqa: E402
+from analytics.cube import AlertCube  # noqa: E402
+from analytics.episodes import build_episodes  # noqa: E402
+from analytics.filters import FilterEngine, FilterIndex  # noqa: E402
+from analytics.ingest import normalize_frame  # noqa: E402
+from analytics.insights import compute_insights  # noqa: E402
+from analytics.partitions import latest_months, list_partitions, read_partitions, write_partitions  # noqa: E402
+from analytics.pipeline import ROLLUPS, kpis, rollup, select  # noqa: E402
+from analytics.risk import categorize_risk  # noqa: E402
+from analytics.schema import SOURCE_COLUMN, sort_by_start  # noqa: E402
+from benchmarks.synthetic import make_alerts  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+REGRESSION_TOLERANCE = 1.25
+
+
+def timed(fn, repeat):
+    """Best wall time over ``repeat`` runs, plus the last result."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def typical_selection(df):
+    # A supervisor's usual view: last two months, one shift, the night hours
+    months = sorted(df["month"].dropna().unique())[-2:]
+    return {"months": months, "shifts": [2], "hour_range": (0, 6)}
+
+
+def week_selection(df):
+    # One week of night hours: served by the start-ordered time index
+    last = df["date"].max()
+    return {"date_range": (last - pd.Timedelta(days=6), last), "hour_range": (0, 6)}
+
+
+def bench_size(n, repeat, workdir):
+    results = []
+
+    def record(stage, fn, rows_in, reps=repeat):
+        seconds, out = timed(fn, reps)
+        rows_out = len(out) if hasattr(out, "__len__") and not isinstance(out, dict) else None
+        results.append({"rows": n, "stage": stage, "seconds": seconds, "rows_in": rows_in, "rows_out": rows_out})
+        return out
+
+    raw = make_alerts(n)
+    # normalize mutates its input, so each repeat works on a fresh copy
+    df, column_map = record("load.normalize", lambda: normalize_frame(raw.copy()), n, reps=1)
+    del raw
+    df = record("load.sort", lambda: sort_by_start(df), n, reps=1)
+
+    cache_file = os.path.join(workdir, f"bench-{n}.feather")
+    record("load.cache_write", lambda: write_frame(df, column_map, cache_file), n, reps=1)
+    record("load.cache_read", lambda: read_frame(cache_file)[0], n)
+    # Same rows as site/year/month partitions; a one-month read against the full cache_read above
+    parts = os.path.join(workdir, f"bench-{n}.parts")
+    record("partitions.write", lambda: write_partitions(df.assign(**{SOURCE_COLUMN: "bench"}), column_map, {}, parts),
+           n, reps=1)
+    month = latest_months(list_partitions(parts), 1)
+    record("partitions.read_month", lambda: read_partitions(parts, month)[0], n)
+
+    index = record("filter.index", lambda: _warm_index(df, column_map), n, reps=1)
+    selection = typical_selection(df)
+    engine = record("filter.mask", lambda: select(FilterEngine(index), column_map, **selection), n)
+    filtered = record("filter.materialize", lambda: engine.apply(df), n)
+    week = week_selection(df)
+    record("filter.week_window", lambda: select(FilterEngine(index), column_map, **week).apply(df), n)
+
+    record("risk.categorize", lambda: categorize_risk(filtered[column_map.speed], filtered["hour"]), len(filtered))
+
+    cube = record("cube.build", lambda: AlertCube(df, column_map), n, reps=1)
+    view = record("cube.filter", lambda: cube.view(engine), len(cube.cells))
+    for name in ROLLUPS:
+        record(f"aggregate.{name}", lambda name=name: rollup(name, view, column_map), len(view.cells))
+    record("kpis", lambda: kpis(view, column_map), len(view.cells))
+    record("insights", lambda: compute_insights(view, column_map), len(view.cells))
+    # Partition-only selection (last two months, one shift): quantiles and distinct counts off merged sketches
+    months = select(FilterEngine(index), column_map, months=selection["months"], shifts=[2])
+    record("sketch.merge", lambda: cube.sketches.merge(months), len(cube.sketches.partitions))
+    record("episodes.build", lambda: build_episodes(df, column_map), n, reps=1)
+    os.remove(cache_file)
+    shutil.rmtree(parts)
+    return results
+
+
+def _warm_index(df, column_map):
+    index = FilterIndex(df)
+    for col in ["year", "month", "week", "date", column_map.operator, column_map.shift, "hour"]:
+        if col:
+            index.codes(col)
+    index.time_index()
+    return index
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path, tolerance=REGRESSION_TOLERANCE):
+    """Print stages slower than the baseline by more than ``tolerance``; return how many."""
+    with open(baseline_path) as f:
+        baseline = {(r["rows"], r["stage"]): r["seconds"] for r in json.load(f)["results"]}
+    regressions = 0
+    for r in results:
+        before = baseline.get((r["rows"], r["stage"]))
+        if before and r["seconds"] > before * tolerance and r["seconds"] - before > 0.005:
+            regressions += 1
+            print(f"REGRESSION {r['stage']} @ {r['rows']:,} rows: {before:.4f}s -> {r['seconds']:.4f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the best time is kept (default: 3)")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="baseline JSON; exit non-zero on regressions")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            size_results = bench_size(n, args.repeat, workdir)
+            for r in size_results:
+                print(f"{r['rows']:>10,}  {r['stage']:<28} {r['seconds']:>10.4f}s")
+            results.extend(size_results)
+
+    report = {"environment": environment(), "results": results}
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results",
+        f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"results written to {output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Synthetic alert exports with the same columns and value shapes as ``manual fatique.xlsx``.
+
+Frames come out as ``pd.read_excel`` would return them (raw headers, the
+duplicated "(GMT+8 / WITA)" header mangled to "....1"), so they go through
+the real normalization path.
+"""
+import numpy as np
+import pandas as pd
+
+SITES = ["SDJ", "ADT", "IPR", "BMO"]
+FLEET_TYPES = ["OB HAULLER", "HAULING COAL", "FUEL TRUCK", "WATER TRUCK"]
+# Alerts cluster in the early-morning circadian low, as in the real exports
+HOUR_WEIGHTS = np.array([35, 500, 506, 587, 622, 183, 23, 12, 61, 91, 115, 126,
+                         10, 125, 93, 50, 27, 9, 3, 1, 17, 29, 105, 123], dtype="float64")
+
+
+def make_alerts(n, operators=None, days=365, start="2025-01-01", seed=0):
+    """Return ``n`` raw alert rows spread over ``days`` days."""
+    rng = np.random.default_rng(seed)
+    operators = operators or max(50, min(20_000, n // 4))
+    assets = max(10, operators // 3)
+
+    day = rng.integers(0, days, n)
+    hour = rng.choice(24, n, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    seconds = rng.integers(0, 3600, n)
+    begin = pd.Timestamp(start) + pd.to_timedelta(day, "D") + pd.to_timedelta(hour, "h") + pd.to_timedelta(seconds, "s")
+    duration = pd.to_timedelta(np.minimum(rng.exponential(300, n), 7200).astype("int64"), "s")
+
+    asset_id = rng.integers(0, assets, n)
+    site = np.array(SITES)[asset_id % len(SITES)]
+    fleet = np.char.add(np.char.add(site, " - "), np.array(FLEET_TYPES)[asset_id % len(FLEET_TYPES)])
+    fleet_number = np.char.add(np.char.add(site, " - HD"), asset_id.astype(str))
+    operator_id = rng.integers(0, operators, n)
+
+    return pd.DataFrame({
+        "Ticket Number": np.char.add("PDSM", np.arange(n).astype(str)),
+        "Parent Fleet": fleet,
+        "Fleet Number": fleet_number,
+        "NIK": (10_000_000 + operator_id).astype("float64"),
+        "Operator Name": np.char.add("Operator ", operator_id.astype(str)),
+        "SID/Code": np.nan,
+        "Area Kerja": np.nan,
+        "Alarm Type": "Driver Fatigue",
+        "(GMT+8 / WITA)": begin,
+        "(GMT+8 / WITA).1": begin + duration,
+        "Shift": np.where((hour >= 6) & (hour < 18), 1, 2),
+        "(in km/hour)": np.clip(rng.gamma(3.0, 6.0, n), 0, 70).astype("int64"),
+        "(Area)": np.nan,
+        "Condition": np.nan,
+        "Validation Status": "Validated",
+        "Follow Up Status": "Close",
+        "Validation Remarks": "Valid",
+        "QC Status": "Yes",
+    })